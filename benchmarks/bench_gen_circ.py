@@ -0,0 +1,60 @@
+"""Circuit building for reset/CSR sweeps: gen_circ() in a loop against gen_circ_sweep().
+
+The sweep is the one of reset.ipynb (states |0>..|3>, 0..5 reset rounds) for both the plain
+reset and CSR, on every qubit of 7-, 27- and 127-qubit fake backends.
+
+Usage:
+    python benchmarks/bench_gen_circ.py [--sizes 7 27 127] [--repeat 3]
+"""
+import argparse
+import time
+
+from devices import DEVICE_SIZES, fake_backend, synthetic_sched
+from utils.higher_energy_states import gen_circ, gen_circ_sweep
+
+STATES = range(4)
+NUM_RESET_LIST = range(6)
+
+
+def gen_circ_loop(num_qubits, sched, add_secure_reset):
+    qubit_list = list(range(num_qubits))
+    return [[gen_circ(state, num_qubits, qubit_list, sched, num_reset = num_reset, add_secure_reset = add_secure_reset)
+             for num_reset in NUM_RESET_LIST] for state in STATES]
+
+
+def gen_circ_grid(num_qubits, sched, add_secure_reset):
+    return gen_circ_sweep(STATES, num_qubits, list(range(num_qubits)), sched, num_reset_list = NUM_RESET_LIST, add_secure_reset = add_secure_reset)
+
+
+def best_time(func, repeat, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_gen_circ(sizes = DEVICE_SIZES, repeat = 3):
+    """Return {(num_qubits, protocol): (loop seconds, sweep seconds)}."""
+    results = {}
+    for num_qubits in sizes:
+        sched = synthetic_sched(fake_backend(num_qubits))
+        sched.create_scheds(lazy = False)
+        for add_secure_reset in [False, True]:
+            protocol = 'csr' if add_secure_reset else 'reset'
+            results[(num_qubits, protocol)] = (
+                best_time(gen_circ_loop, repeat, num_qubits, sched, add_secure_reset),
+                best_time(gen_circ_grid, repeat, num_qubits, sched, add_secure_reset),
+            )
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--sizes', type = int, nargs = '+', default = list(DEVICE_SIZES))
+    parser.add_argument('--repeat', type = int, default = 3)
+    args = parser.parse_args()
+
+    for (num_qubits, protocol), (loop, sweep) in bench_gen_circ(args.sizes, args.repeat).items():
+        print(f"{num_qubits:4d} qubits, {protocol:5s}: gen_circ loop {loop * 1e3:9.1f} ms, gen_circ_sweep {sweep * 1e3:9.1f} ms, {loop / sweep:5.1f}x")
@@ -0,0 +1,245 @@
+"""Client-side hot paths of the utils on 7-, 27- and 127-qubit fake backends, offline.
+
+Results come from SyntheticBackend (random counts and IQ payloads), so every case times only
+our own code: schedule building, circuit generation, adjacency lookups, count and IQ
+reductions, and the VQE objective on an ansatz as wide as the device, through the batched
+SPSA path (vqe_batch_func) of vqe_custom.py.
+
+Usage:
+    python benchmarks/bench_hot_paths.py [--sizes 7 27 127] [--repeat 3] [--cases gen_circ.csr vqe_func]
+"""
+import argparse
+import os
+import sys
+import time
+
+from bench_gen_circ import gen_circ_loop
+from devices import DEVICE_SIZES, SyntheticBackend, fake_backend, synthetic_counts, synthetic_sched
+from utils.backend_utils import check_adjacency
+from utils.higher_energy_states import pulse_gate
+from utils.job_utils import get_job_data
+from utils.result_utils import marginal_counts_array, single_qubit_count
+
+VQE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'experiments', '3-attack_on_quantum_algorithms', 'vqe')
+
+# sweep of reset.ipynb: 4 states x 0..5 resets
+NUM_SWEEP_CIRCUITS = 24
+COUNT_SHOTS = 1000
+IQ_SHOTS = 1024
+
+
+def best_time(func, repeat):
+    """Best of `repeat` timed calls, after one untimed warm-up call (imports, first-use caches)."""
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_create_scheds(num_qubits, repeat):
+    """Building the X12/X23 schedules of every qubit, with the shared schedule cache emptied."""
+    sched = synthetic_sched(fake_backend(num_qubits))
+
+    def create():
+        pulse_gate._sched_cache.clear()
+        sched.create_scheds(lazy = False)
+    return best_time(create, repeat)
+
+
+def bench_get_sched(num_qubits, repeat):
+    """Lazy create_scheds() and a get_sched() of both labels on every qubit, schedules cached."""
+    sched = synthetic_sched(fake_backend(num_qubits))
+    sched.create_scheds(lazy = False)
+
+    def get():
+        sched.create_scheds()
+        for qubit in range(num_qubits):
+            sched.get_sched('X12', qubit)
+            sched.get_sched('X23', qubit)
+    return best_time(get, repeat)
+
+
+def _bench_gen_circ(add_secure_reset):
+    def bench(num_qubits, repeat):
+        sched = synthetic_sched(fake_backend(num_qubits))
+        sched.create_scheds(lazy = False)
+        return best_time(lambda: gen_circ_loop(num_qubits, sched, add_secure_reset), repeat)
+    bench.__doc__ = f"gen_circ() of |0>..|3> with 0..5 {'CSR' if add_secure_reset else 'reset'} rounds on every qubit."
+    return bench
+
+
+def bench_check_adjacency(num_qubits, repeat):
+    """check_adjacency() of every pair of coupled qubit pairs."""
+    backend = fake_backend(num_qubits)
+    pairs = sorted({tuple(sorted(pair)) for pair in backend.configuration().coupling_map})
+
+    def check():
+        for pair_one in pairs:
+            for pair_two in pairs:
+                check_adjacency(pair_one, pair_two, backend)
+    return best_time(check, repeat)
+
+
+def bench_single_qubit_count(num_qubits, repeat):
+    """single_qubit_count() of every qubit over a sweep of counts, one call per qubit."""
+    counts = synthetic_counts(NUM_SWEEP_CIRCUITS, num_qubits, COUNT_SHOTS)
+    return best_time(lambda: [single_qubit_count(counts, qubit) for qubit in range(num_qubits)], repeat)
+
+
+def bench_marginal_counts_array(num_qubits, repeat):
+    """marginal_counts_array() of all qubits over a sweep of counts, in one call."""
+    counts = synthetic_counts(NUM_SWEEP_CIRCUITS, num_qubits, COUNT_SHOTS)
+    return best_time(lambda: marginal_counts_array(counts), repeat)
+
+
+def _iq_job(num_qubits, meas_return):
+    from qiskit import QuantumCircuit
+
+    circ = QuantumCircuit(num_qubits, num_qubits)
+    circ.measure(range(num_qubits), range(num_qubits))
+    return SyntheticBackend(fake_backend(num_qubits)).run([circ] * NUM_SWEEP_CIRCUITS, shots = IQ_SHOTS, meas_level = 1, meas_return = meas_return)
+
+
+def bench_get_job_data_avg(num_qubits, repeat):
+    """get_job_data() of averaged IQ data of a sweep."""
+    job = _iq_job(num_qubits, 'avg')
+    return best_time(lambda: get_job_data(job, average = True), repeat)
+
+
+def bench_get_job_data_single(num_qubits, repeat):
+    """get_job_data() of single-shot IQ data of a sweep."""
+    job = _iq_job(num_qubits, 'single')
+    return best_time(lambda: get_job_data(job, average = False), repeat)
+
+
+def bench_get_job_data_stream(num_qubits, repeat):
+    """get_job_data(stream = True) of single-shot IQ data of a sweep."""
+    job = _iq_job(num_qubits, 'single')
+    return best_time(lambda: get_job_data(job, average = False, stream = True), repeat)
+
+
+def _vqe_problem(num_qubits):
+    """Transverse-field Ising chain on num_qubits qubits: ZZ and X terms, two measurement bases;
+    TwoLocal ry/cx ansatz with linear entanglement, 2 * num_qubits parameters."""
+    from qiskit import QuantumCircuit
+    from qiskit.circuit.library import TwoLocal
+
+    ansatz = TwoLocal(num_qubits, 'ry', 'cx', entanglement = 'linear', reps = 1)
+    hamiltonian = [(1.0, 'I' * i + 'ZZ' + 'I' * (num_qubits - i - 2)) for i in range(num_qubits - 1)]
+    hamiltonian += [(0.5, 'I' * i + 'X' + 'I' * (num_qubits - i - 1)) for i in range(num_qubits)]
+    state_prep = QuantumCircuit(num_qubits)
+    state_prep.x(range(0, num_qubits, 2))
+    return hamiltonian, ansatz, state_prep
+
+
+def _run_vqe(backend, num_qubits, maxiter):
+    """Run vqe_custom.main() with SPSA, whose iterations go through vqe_batch_func.
+    Return (total seconds, [(number of parameter vectors, seconds) of every batch_func call])."""
+    import numpy as np
+
+    if VQE_DIR not in sys.path:
+        sys.path.insert(0, VQE_DIR)
+    import vqe_custom
+
+    class Messenger:
+        def publish(self, message):
+            pass
+
+    batches = []
+    fmin_spsa = vqe_custom.fmin_spsa
+
+    def timed_fmin_spsa(func, x0, batch_func = None, **kwargs):
+        def timed_batch_func(xs, *args):
+            start = time.perf_counter()
+            values = batch_func(xs, *args)
+            batches.append((len(xs), time.perf_counter() - start))
+            return values
+        return fmin_spsa(func, x0, batch_func = timed_batch_func, **kwargs)
+
+    hamiltonian, ansatz, state_prep = _vqe_problem(num_qubits)
+    np.random.seed(0)
+    vqe_custom.fmin_spsa = timed_fmin_spsa
+    try:
+        start = time.perf_counter()
+        vqe_custom.main(backend, Messenger(), hamiltonian, ansatz, initial_parameters = np.full(ansatz.num_parameters, 0.1),
+                        state_prep_circ = state_prep, optimizer = 'SPSA', optimizer_config = {"maxiter": maxiter}, shots = 1024)
+        total = time.perf_counter() - start
+    finally:
+        vqe_custom.fmin_spsa = fmin_spsa
+    return total, batches
+
+
+_vqe_runs_cache = {}
+
+
+def _vqe_runs(num_qubits, repeat, maxiter = 6):
+    """`repeat` SPSA runs after a warm-up run, shared by the vqe cases."""
+    if (num_qubits, repeat) not in _vqe_runs_cache:
+        backend = SyntheticBackend(fake_backend(num_qubits))
+        _run_vqe(backend, num_qubits, 1)
+        _vqe_runs_cache[(num_qubits, repeat)] = [_run_vqe(backend, num_qubits, maxiter) for _ in range(repeat)]
+    return _vqe_runs_cache[(num_qubits, repeat)]
+
+
+def bench_vqe_setup(num_qubits, repeat):
+    """vqe_custom.main() apart from the evaluations: transpiling templates, grouping terms, slots."""
+    return min(total - sum(seconds for _, seconds in batches) for total, batches in _vqe_runs(num_qubits, repeat))
+
+
+def bench_vqe_batch_func(num_qubits, repeat):
+    """One SPSA iteration through vqe_batch_func: the +/- perturbations and the previous step's
+    value, bound, run as one job, decoded and reduced together. Median over the iterations."""
+    import numpy as np
+
+    return min(float(np.median([seconds for num_vectors, seconds in batches if num_vectors == 3]))
+               for _, batches in _vqe_runs(num_qubits, repeat))
+
+
+def bench_vqe_func(num_qubits, repeat):
+    """One evaluation of the VQE objective at a single parameter vector (SPSA's final value)."""
+    return min(batches[-1][1] for _, batches in _vqe_runs(num_qubits, repeat))
+
+
+CASES = {
+    'Sched.create_scheds': bench_create_scheds,
+    'Sched.get_sched': bench_get_sched,
+    'gen_circ.reset': _bench_gen_circ(False),
+    'gen_circ.csr': _bench_gen_circ(True),
+    'check_adjacency': bench_check_adjacency,
+    'single_qubit_count': bench_single_qubit_count,
+    'marginal_counts_array': bench_marginal_counts_array,
+    'get_job_data.avg': bench_get_job_data_avg,
+    'get_job_data.single': bench_get_job_data_single,
+    'get_job_data.stream': bench_get_job_data_stream,
+    'vqe.setup': bench_vqe_setup,
+    'vqe_batch_func': bench_vqe_batch_func,
+    'vqe_func': bench_vqe_func,
+}
+
+
+def bench_hot_paths(sizes = DEVICE_SIZES, repeat = 3, cases = None):
+    """Return {case: {num_qubits: seconds}}, best of `repeat`."""
+    import logging
+    import warnings
+
+    logging.disable(logging.WARNING)
+    results = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for name in cases or CASES:
+            results[name] = {num_qubits: CASES[name](num_qubits, repeat) for num_qubits in sizes}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--sizes', type = int, nargs = '+', default = list(DEVICE_SIZES))
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--cases', nargs = '+', choices = list(CASES), default = None)
+    args = parser.parse_args()
+
+    for name, times in bench_hot_paths(args.sizes, args.repeat, args.cases).items():
+        print(f"{name:24s}" + "".join(f"{num_qubits:5d} qubits {seconds * 1e3:10.2f} ms" for num_qubits, seconds in times.items()))
@@ -0,0 +1,41 @@
+"""Job submission throughput: serial run_exp() against the thread pool in submit_jobs().
+
+The fake backend, tests/fake_backends.LatencyBackend, needs no qiskit: every run() call sleeps
+for a fixed round-trip latency, and calls beyond its concurrent capacity are rejected with a
+job-limit error, as the IBM Quantum providers do when too many jobs are queued.
+
+Usage:
+    python benchmarks/bench_submission.py [--jobs 48] [--latency 0.05] [--capacity 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tests.fake_backends import LatencyBackend
+from utils.experiment_utils import run_exp
+
+
+def bench_submission(num_jobs = 48, latency = 0.05, capacity = 8, max_workers_list = (1, 4, 8, 16)):
+    """Return {max_workers: (jobs per second, rejected submissions)}."""
+    results = {}
+    for max_workers in max_workers_list:
+        backend = LatencyBackend(latency, capacity)
+        start = time.perf_counter()
+        job_ids = run_exp(None, num_jobs, backend, max_workers = max_workers)
+        elapsed = time.perf_counter() - start
+        assert len(set(job_ids)) == num_jobs
+        results[max_workers] = (num_jobs / elapsed, backend.rejected)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--jobs', type = int, default = 48)
+    parser.add_argument('--latency', type = float, default = 0.05)
+    parser.add_argument('--capacity', type = int, default = 8)
+    args = parser.parse_args()
+
+    for max_workers, (throughput, rejected) in bench_submission(args.jobs, args.latency, args.capacity).items():
+        print(f"max_workers = {max_workers:3d}: {throughput:8.1f} jobs/s, {rejected} rejected and retried")
@@ -0,0 +1,132 @@
+"""Synthetic devices shared by the benchmarks: qiskit fake backends of 7, 27 and 127 qubits
+with generated X12/X23 gate data, so nothing needs IBM Quantum access."""
+import copy
+import os
+import sys
+import uuid
+
+import numpy as np
+from qiskit.providers import BackendV1, JobStatus, JobV1, Options
+from qiskit.result import Result
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.higher_energy_states import Sched
+
+DEVICE_SIZES = (7, 27, 127)
+
+
+def fake_backend(num_qubits):
+    from qiskit.providers import fake_provider
+    return {
+        7: fake_provider.FakeLagos,
+        27: fake_provider.FakeMumbai,
+        127: fake_provider.FakeWashington,
+    }[num_qubits]()
+
+
+def synthetic_sched(backend):
+    """Sched with plausible X12/X23 calibrations on every qubit of backend (schedules not built)."""
+    num_qubits = backend.configuration().n_qubits
+    freq_12_list = [4.6e9 + 1e6 * qubit for qubit in range(num_qubits)]
+    freq_23_list = [4.3e9 + 1e6 * qubit for qubit in range(num_qubits)]
+    amp_12_list = [0.25 + 0.001 * qubit for qubit in range(num_qubits)]
+    amp_23_list = [0.35 + 0.001 * qubit for qubit in range(num_qubits)]
+    sched = Sched(backend)
+    sched.parse_pi_12_23_gate_data(freq_12_list, amp_12_list, freq_23_list, amp_23_list)
+    return sched
+
+
+def synthetic_outcomes(num_clbits, shots, rng, p1 = 0.1):
+    """Sample `shots` outcomes of num_clbits independent bits, each 1 with probability p1.
+    Return (outcomes as python ints, counts), so registers wider than 64 bits work."""
+    bits = rng.random((shots, num_clbits)) < p1
+    rows, counts = np.unique(np.packbits(bits, axis = 1, bitorder = 'little'), axis = 0, return_counts = True)
+    return [int.from_bytes(row.tobytes(), 'little') for row in rows], counts
+
+
+def synthetic_counts(num_circuits, num_clbits, shots, seed = 0):
+    """Counts dictionaries with bitstring keys, as result.get_counts() returns them."""
+    rng = np.random.default_rng(seed)
+    counts = []
+    for _ in range(num_circuits):
+        outcomes, values = synthetic_outcomes(num_clbits, shots, rng)
+        counts.append({format(outcome, f'0{num_clbits}b'): int(value) for outcome, value in zip(outcomes, values)})
+    return counts
+
+
+class SyntheticBackend(BackendV1):
+    """Backend with the configuration and properties of `backend` whose jobs return random payloads
+    at once: counts of independent bits (meas_level 2) or Gaussian IQ points (meas_level 1).
+    Circuits are not simulated, so any gate set and width runs and only the client side
+    (building, binding, decoding, reducing) is measured."""
+
+    def __init__(self, backend, seed = 0):
+        configuration = copy.deepcopy(backend.configuration())
+        configuration.simulator = True
+        super().__init__(configuration)
+        self._backend = backend
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def _default_options(cls):
+        return Options(shots = 1024, memory = False, meas_level = 2, meas_return = 'avg', rep_delay = None, init_qubits = True)
+
+    def properties(self):
+        return self._backend.properties()
+
+    def defaults(self):
+        return self._backend.defaults()
+
+    def run(self, run_input, **options):
+        circuits = run_input if isinstance(run_input, list) else [run_input]
+        run_options = dict(self.options.__dict__, **options)
+        return SyntheticJob(self, str(uuid.uuid4()), run_options, Result.from_dict({
+            "backend_name": self.name(),
+            "backend_version": self.configuration().backend_version,
+            "qobj_id": "synthetic",
+            "job_id": "synthetic",
+            "success": True,
+            "results": [self._experiment_result(circ, run_options) for circ in circuits],
+        }))
+
+    def _experiment_result(self, circ, options):
+        shots, num_clbits = options["shots"], circ.num_clbits
+        if options["meas_level"] == 2:
+            outcomes, values = synthetic_outcomes(num_clbits, shots, self._rng)
+            data = {"counts": {hex(outcome): int(value) for outcome, value in zip(outcomes, values)}}
+        else:
+            iq = self._rng.normal(size = (shots, num_clbits, 2))
+            data = {"memory": (iq.mean(axis = 0) if options["meas_return"] == 'avg' else iq).tolist()}
+        return {
+            "shots": shots,
+            "success": True,
+            "data": data,
+            "meas_level": options["meas_level"],
+            "meas_return": options["meas_return"],
+            "header": {
+                "name": circ.name,
+                "memory_slots": num_clbits,
+                "creg_sizes": [[register.name, register.size] for register in circ.cregs],
+                "clbit_labels": [[register.name, i] for register in circ.cregs for i in range(register.size)],
+                "metadata": circ.metadata,
+            },
+        }
+
+
+class SyntheticJob(JobV1):
+    def __init__(self, backend, job_id, options, result):
+        super().__init__(backend, job_id)
+        self._options = options
+        self._result = result
+
+    def submit(self):
+        pass
+
+    def result(self, timeout = None):
+        return self._result
+
+    def status(self):
+        return JobStatus.DONE
+
+    def backend_options(self):
+        return dict(self._options, n_qubits = self.backend().configuration().n_qubits)
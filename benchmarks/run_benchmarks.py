@@ -0,0 +1,101 @@
+"""Run the hot-path benchmarks and record them as, or compare them against, a JSON baseline.
+
+The baseline maps every case and device size to seconds, with the environment it was measured in:
+    {"environment": {...}, "repeat": 3, "results": {"gen_circ.csr": {"7": 0.011, "27": ..., "127": ...}, ...}}
+A case is a regression when it is slower than the baseline by more than --tolerance (relative)
+and --min-delta (absolute seconds, so sub-millisecond noise does not count).
+
+Usage:
+    python benchmarks/run_benchmarks.py --save             # write benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py                    # compare against it; exit code 1 on a regression
+    python benchmarks/run_benchmarks.py --cases vqe_func --sizes 27 --tolerance 0.5
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+
+from bench_hot_paths import CASES, bench_hot_paths
+from devices import DEVICE_SIZES
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def environment():
+    import numpy
+    import qiskit
+
+    return {
+        "date": str(datetime.now())[:19],
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "qiskit": qiskit.__version__,
+    }
+
+
+def save_baseline(results, repeat, filename = BASELINE):
+    """Write {case: {num_qubits: seconds}} as a baseline (write-then-rename)."""
+    baseline = {
+        "environment": environment(),
+        "repeat": repeat,
+        "results": {name: {str(num_qubits): seconds for num_qubits, seconds in times.items()} for name, times in results.items()},
+    }
+    with open(f"{filename}.{os.getpid()}.tmp", 'w') as f:
+        json.dump(baseline, f, indent = 4)
+    os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+
+
+def compare(results, baseline, tolerance = 0.25, min_delta = 1e-3):
+    """Compare results with a loaded baseline.
+    Return:
+        list: (case, num_qubits, baseline seconds or None, seconds, regressed) for every measured point.
+    """
+    rows = []
+    for name, times in results.items():
+        for num_qubits, seconds in times.items():
+            reference = baseline["results"].get(name, {}).get(str(num_qubits))
+            regressed = reference is not None and seconds > reference * (1 + tolerance) and seconds - reference > min_delta
+            rows.append((name, num_qubits, reference, seconds, regressed))
+    return rows
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--sizes', type = int, nargs = '+', default = list(DEVICE_SIZES))
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--cases', nargs = '+', choices = list(CASES), default = None)
+    parser.add_argument('--baseline', default = BASELINE, help = "Baseline JSON file.")
+    parser.add_argument('--save', action = 'store_true', help = "Write the results as the baseline instead of comparing.")
+    parser.add_argument('--tolerance', type = float, default = 0.25, help = "Allowed relative slowdown.")
+    parser.add_argument('--min-delta', type = float, default = 1e-3, help = "Allowed absolute slowdown in seconds.")
+    args = parser.parse_args(argv)
+
+    results = bench_hot_paths(args.sizes, args.repeat, args.cases)
+    if args.save:
+        save_baseline(results, args.repeat, args.baseline)
+        for name, times in results.items():
+            print(f"{name:24s}" + "".join(f"{num_qubits:5d} qubits {seconds * 1e3:10.2f} ms" for num_qubits, seconds in times.items()))
+        print(f'baseline was saved to "{args.baseline}"')
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        raise ValueError(f"No baseline {args.baseline}; record one with --save.")
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.tolerance, args.min_delta)
+    for name, num_qubits, reference, seconds, regressed in rows:
+        change = f"{seconds / reference - 1:+8.1%}" if reference else "     new"
+        reference = f"{reference * 1e3:10.2f} ms" if reference is not None else " " * 13
+        print(f"{name:24s}{num_qubits:5d} qubits {reference} -> {seconds * 1e3:10.2f} ms {change}{'  REGRESSION' if regressed else ''}")
+    num_regressed = sum(row[-1] for row in rows)
+    print(f"{num_regressed} regression(s) against {args.baseline}")
+    return 1 if num_regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
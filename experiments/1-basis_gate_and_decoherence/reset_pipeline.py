@@ -0,0 +1,31 @@
+"""Pipeline spec of the reset experiments of reset.ipynb: P(|1>) after 0..5 reset gates on |0>..|3>,
+with plain and secure resets, on every qubit of the backend.
+
+    python -m utils.pipeline experiments/1-basis_gate_and_decoherence/reset_pipeline.py --dir runs/reset --backend fake_lagos
+"""
+import os
+
+from utils.higher_energy_states import Sched, gen_circ
+
+GATE_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'ibm_lagos_gate_data.json')
+NUM_RESET_LIST = list(range(6))
+SHOTS = 10000
+
+
+def build_sweep(backend, add_secure_reset):
+    sched = Sched(backend)
+    sched.load_gate_data(GATE_DATA)
+    sched.create_scheds()
+    num_qubit = backend.configuration().n_qubits
+    qubit_list = list(range(num_qubit))
+    return {
+        (state, num_reset): gen_circ(state, num_qubit, qubit_list, sched, num_reset = num_reset, add_secure_reset = add_secure_reset)
+        for state in range(4) for num_reset in NUM_RESET_LIST
+    }
+
+
+
+def setup(pipeline):
+    qubit_layout = list(range(pipeline.backend.configuration().n_qubits))
+    pipeline.add_experiment('reset', lambda backend: build_sweep(backend, False), qubit_layout = qubit_layout, shots = SHOTS, rep_delay = 500e-6)
+    pipeline.add_experiment('secure_reset', lambda backend: build_sweep(backend, True), qubit_layout = qubit_layout, shots = SHOTS, rep_delay = 300e-6)
@@ -69,6 +69,26 @@ meta["spec"]["parameters"] = {
             "type": "boolean",
             "default": False,
         },
+        "interim_log": {
+            "description": "File to append the interim results to as a binary log, for local runs. Read with utils/interim_utils.py.",
+            "type": "string",
+            "default": "None"
+        },
+        "mitigation_cals": {
+            "description": "Earlier mitigation calibrations to reuse, {qubit: {cal, timestamp}}, e.g. the mitigation_cals of an earlier result.",
+            "type": "object",
+            "default": "None"
+        },
+        "mitigation_cache": {
+            "description": "Directory of the mitigation calibration cache, for local runs.",
+            "type": "string",
+            "default": "None"
+        },
+        "mitigation_max_age": {
+            "description": "Age in seconds after which a mitigation calibration is calibrated again.",
+            "type": "number",
+            "default": 3600
+        },
     },
     "required": ["hamiltonian"],
 }
@@ -1,26 +1,75 @@
 # Grab functions and modules from dependencies
+import json
+import os
+import time
+
 import numpy as np
 import scipy.optimize as opt
 from scipy.optimize import OptimizeResult
 import mthree
 
 # Grab functions and modules from Qiskit needed
+import qiskit
 from qiskit import QuantumCircuit, transpile
+from qiskit.circuit import ParameterExpression
 import qiskit.circuit.library.n_local as lib_local
 
 
 
+# Binary interim log: this magic and the number of parameters (int64), then one fixed-width
+# row per step: step (int64), energy (float64), parameters (float64 each), all little-endian.
+# Read by utils/interim_utils.py, which uses the same layout.
+INTERIM_LOG_MAGIC = b"VQELOG01"
+
+# bind_template() builds circuits with the internal QuantumCircuit._append. This program is
+# uploaded on its own to Runtime, whose qiskit we do not control, so that fast path is only
+# taken on the qiskit-terra versions it was written for; elsewhere it uses assign_parameters().
+FAST_BIND = (0, 21) <= tuple(int(part) for part in qiskit.__version__.split(".")[:2]) < (1, 0)
+
+
 class Publisher:
-    """Class used to publish interim results."""
+    """Class used to publish interim results.
 
-    def __init__(self, messenger):
+    With log_file, every interim result is also appended to a binary log as one
+    fixed-width row, and flushed, so the log survives an interrupted run.
+    """
+
+    def __init__(self, messenger, log_file=None):
         self._messenger = messenger
+        self._log_file = log_file
+        self._num_rows = 0
 
     def callback(self, *args, **kwargs):
         text = list(args)
         for k, v in kwargs.items():
             text.append({k: v})
         self._messenger.publish(text)
+        if self._log_file:
+            self.log(*args)
+
+    def log(self, *args):
+        """Append one row to the binary log, from SPSA's (step, x, value) or SciPy's (xk,)."""
+        if len(args) == 3:
+            step, params, energy = args
+        else:
+            step, params, energy = self._num_rows, args[0], None
+        params = np.asarray(params, dtype="<f8").ravel()
+        header = INTERIM_LOG_MAGIC + np.int64(params.size).astype("<i8").tobytes()
+        with open(self._log_file, "ab+") as f:
+            size = f.seek(0, 2)
+            if size == 0:
+                f.write(header)
+            elif not self._num_rows:
+                # appending to an earlier run's log: its rows must have the same width,
+                # and a row torn by an interrupted write is dropped
+                f.seek(0)
+                if f.read(len(header)) != header:
+                    raise ValueError("{} is not an interim log of {} parameters.".format(self._log_file, params.size))
+                f.truncate(size - (size - len(header)) % (16 + 8 * params.size))
+            f.write(np.int64(step).astype("<i8").tobytes())
+            f.write(np.float64(np.nan if energy is None else energy).astype("<f8").tobytes())
+            f.write(params.tobytes())
+        self._num_rows += 1
 
 
 
@@ -41,6 +90,10 @@ def main(
     optimizer_config={"maxiter": 100},
     shots=8192,
     use_measurement_mitigation=False,
+    interim_log=None,
+    mitigation_cals=None,
+    mitigation_cache=None,
+    mitigation_max_age=3600,
 ):
 
     """
@@ -63,9 +116,20 @@ def main(
         shots (int): Optional, number of shots to take per circuit.
         use_measurement_mitigation (bool): Optional, use measurement mitigation,
                                            default=False.
+        interim_log (str): Optional, file to append the interim results to as a
+                           binary log (see INTERIM_LOG_MAGIC), for local runs.
+        mitigation_cals (dict): Optional, earlier mitigation calibrations to reuse,
+                                {qubit: {"cal": matrix, "timestamp": unix time}}, e.g. the
+                                mitigation_cals of an earlier result or load_mitigation_cals().
+        mitigation_cache (str): Optional, directory of the mitigation calibration cache,
+                                for local runs.
+        mitigation_max_age (float): Optional, age in seconds after which a calibration is
+                                    stale and the qubit is calibrated again, default=3600.
 
     Returns:
-        OptimizeResult: The result in SciPy optimization format.
+        OptimizeResult: The result in SciPy optimization format. With measurement
+                        mitigation, its mitigation_cals are the calibrations of the
+                        measured qubits.
     """
 
     # Split the Hamiltonian into two arrays, one for coefficients, the other for
@@ -82,9 +146,13 @@ def main(
     # ansatz_instance = getattr(lib_local, ansatz)
     # ansatz_circuit = ansatz_instance(num_qubits, **ansatz_config)
 
+    # Terms that commute qubit-wise (on every qubit the same Pauli, or an identity on
+    # either side) are measured together in one basis, so each group needs one circuit.
+    meas_bases, term_groups = group_qubitwise_commuting(op_strings)
+
     # Here we use our convenence function from Appendix B to get measurement circuits
     # with the correct single-qubit rotation gates.
-    meas_circs = opstr_to_meas_circ(op_strings)
+    meas_circs = opstr_to_meas_circ(meas_bases)
 
     # When computing the expectation value for the energy, we need to know if we
     # evaluate a Z measurement or and identity measurement.  Here we take and X and Y
@@ -93,31 +161,36 @@ def main(
     meas_strings = [string.replace("X", "Z").replace("Y", "Z") for string in op_strings]
 
     # Take the ansatz circuits, add the single-qubit measurement basis rotations from
-    # meas_circs, and finally append the measurements themselves.
+    # meas_circs, and finally append the measurements themselves. These are the parametric
+    # templates, one per measurement basis, which are bound for every evaluation.
     if state_prep_circ:
         for _ in range(num_reset_after_prep):
             state_prep_circ.reset(range(state_prep_circ.num_qubits))
-        full_circs = []
+        templates = []
         for mcirc in meas_circs:
-            full_circs.append(state_prep_circ)
-            circ = ansatz_circ.copy()
-            circ.compose(mcirc)
+            circ = ansatz_circ.compose(mcirc)
             circ = circ.decompose()
             circ.measure_all()
-            full_circs.append(circ)
-            if add_delay_after_meas:
-                if not backend.configuration().simulator:
-                    acquire_alignment = backend.configuration().timing_constraints['acquire_alignment']
-                    if delay_dt_after_meas % acquire_alignment:
-                        delay_dt_after_meas = int(delay_dt_after_meas + acquire_alignment / 2 ) - (int(delay_dt_after_meas + acquire_alignment / 2 ) % acquire_alignment)
-                delay_circ = QuantumCircuit(ansatz_circ.num_qubits)
-                delay_circ.delay(delay_dt_after_meas, range(circ.num_qubits))
-                full_circs.append(delay_circ)
+            templates.append(circ)
     else:
-        full_circs = [
+        templates = [
             ansatz_circ.compose(mcirc).measure_all(inplace=False) for mcirc in meas_circs
         ]
 
+    # The state preparation and delay circuits do not depend on the parameters, so they are
+    # transpiled once and the same objects are submitted in every evaluation.
+    static_circs = []
+    if state_prep_circ:
+        static_circs.append(state_prep_circ)
+        if add_delay_after_meas:
+            if not backend.configuration().simulator:
+                acquire_alignment = backend.configuration().timing_constraints['acquire_alignment']
+                if delay_dt_after_meas % acquire_alignment:
+                    delay_dt_after_meas = int(delay_dt_after_meas + acquire_alignment / 2 ) - (int(delay_dt_after_meas + acquire_alignment / 2 ) % acquire_alignment)
+            delay_circ = QuantumCircuit(ansatz_circ.num_qubits)
+            delay_circ.delay(delay_dt_after_meas, range(ansatz_circ.num_qubits))
+            static_circs.append(delay_circ)
+
     # Get the number of parameters in the ansatz circuit.
     num_params = ansatz_circ.num_parameters
 
@@ -143,21 +216,58 @@ def main(
     # trans_dict = {}
     # if not backend.configuration().simulator:
     #     trans_dict = {"layout_method": "sabre", "routing_method": "sabre"}
-    trans_circs = transpile(full_circs, backend, optimization_level=0)
+    trans_circs = transpile(static_circs + templates, backend, optimization_level=0)
+    trans_static, trans_templates = trans_circs[:len(static_circs)], trans_circs[len(static_circs):]
+    template_slots = [parametric_slots(template, ansatz_circ.parameters) for template in trans_templates]
+
+    # The circuits of one parameter vector, in submission order: a transpiled static circuit,
+    # or the index of the template whose bound copy goes in its place.
+    if state_prep_circ:
+        layout = []
+        for k in range(len(trans_templates)):
+            layout.append(trans_static[0])
+            layout.append(k)
+            if add_delay_after_meas:
+                layout.append(trans_static[1])
+    else:
+        layout = list(range(len(trans_templates)))
+    # Positions of the ansatz circuits among the circuits of one parameter vector.
+    ansatz_positions = [i for i, entry in enumerate(layout) if isinstance(entry, int)]
 
     # If using measurement mitigation we need to find out which physical qubits our transpiled
     # circuits actually measure, construct a mitigation object targeting our backend, and
     # finally calibrate our mitgation by running calibration circuits on the backend.
+    # Calibrations of the same backend and calibration shots that are younger than
+    # mitigation_max_age are reused, so only the qubits without one are calibrated.
     if use_measurement_mitigation:
-        if state_prep_circ:
-            if add_delay_after_meas:
-                maps = mthree.utils.final_measurement_mapping(trans_circs[1::3])
-            else:
-                maps = mthree.utils.final_measurement_mapping(trans_circs[1::2])
-        else:
-            maps = mthree.utils.final_measurement_mapping(trans_circs)
+        maps = mthree.utils.final_measurement_mapping(trans_templates)
         mit = mthree.M3Mitigation(backend)
-        mit.cals_from_system(maps)
+        cal_shots = min(backend.configuration().max_shots, 10000)
+        cache_file = None
+        if mitigation_cache:
+            cache_file = os.path.join(
+                mitigation_cache, "{}_{}.json".format(backend.configuration().backend_name, cal_shots)
+            )
+        cals = dict(load_mitigation_cals(cache_file, mitigation_max_age)) if cache_file else {}
+        now = time.time()
+        for qubit, entry in (mitigation_cals or {}).items():
+            if entry.get("cal") is not None and now - entry["timestamp"] <= mitigation_max_age:
+                cals[int(qubit)] = {"cal": np.asarray(entry["cal"], dtype=float), "timestamp": entry["timestamp"]}
+
+        qubits = sorted({qubit for qubit_map in maps for qubit in qubit_map.values()})
+        missing = [qubit for qubit in qubits if qubit not in cals]
+        if len(missing) < len(qubits):
+            mit.cals_from_matrices([cals[qubit]["cal"] if qubit in cals else None for qubit in range(mit.num_qubits)])
+            mit.cal_shots = cal_shots
+        if missing:
+            # Calibrate synchronously (mthree 1.x defaults to async_cal=True), so the matrices
+            # exist before they are cached and returned.
+            mit.cals_from_system(missing, shots=cal_shots, async_cal=False)
+            for qubit in missing:
+                if mit.single_qubit_cals[qubit] is not None:
+                    cals[qubit] = {"cal": mit.single_qubit_cals[qubit], "timestamp": now}
+            if cache_file:
+                save_mitigation_cals(cache_file, {qubit: cals[qubit] for qubit in missing if qubit in cals})
 
     # Here we define a callback function that will stream the optimizer parameter vector
     # back to the user after each iteration.  This uses the `user_messenger` object.
@@ -165,77 +275,63 @@ def main(
     # this is not required.
     def callback(step, func, xk):
         user_messenger.publish((step, list(xk), func(xk)))
-    publisher = Publisher(user_messenger)
+    publisher = Publisher(user_messenger, interim_log)
 
-    # This is the primary VQE function executed by the optimizer. This function takes the
-    # parameter vector as input and returns the energy evaluated using an ansatz circuit
-    # bound with those parameters.
-    def vqe_func(params):
-        # Attach (bind) parameters in params vector to the transpiled circuits.
+    # Bitstrings of the hexadecimal count keys seen in this run, for decode_counts().
+    decoded_keys = {}
+
+    # This is the primary VQE function executed by the optimizer. This function takes a
+    # list of parameter vectors as input and returns the energy of each, evaluated using
+    # ansatz circuits bound with those parameters. The circuits of all the vectors are
+    # submitted together in a single job.
+    def vqe_batch_func(params_list):
+        # Bind every params vector to the templates and lay its circuits out with the static ones.
         bound_circs = []
-        if state_prep_circ:
-            if add_delay_after_meas:
-                for i, circ in enumerate(trans_circs):
-                    if i % 3 == 1:
-                        bound_circs.append(circ.bind_parameters(params))
-                    else:
-                        bound_circs.append(circ)
-            else:
-                for i, circ in enumerate(trans_circs):
-                    if i % 2:
-                        bound_circs.append(circ.bind_parameters(params))
-                    else:
-                        bound_circs.append(circ)
-        else:
-            bound_circs = [circ.bind_parameters(params) for circ in trans_circs]
-        # Submit the job and get the resultant counts back
+        for params in params_list:
+            bound = [bind_template(template, slots, params) for template, slots in zip(trans_templates, template_slots)]
+            bound_circs.extend(bound[entry] if isinstance(entry, int) else entry for entry in layout)
+        # Submit the job and get the resultant counts of the ansatz circuits of all vectors back.
+        positions = [block * len(layout) + i for block in range(len(params_list)) for i in ansatz_positions]
         if backend.configuration().simulator:
             if state_prep_circ:
                 num_qubits = len(meas_strings[0])
-                counts = backend.run(bound_circs, shots=shots).result()
-                if add_delay_after_meas:
-                    raw_counts = [result.data.counts for result in backend.run(bound_circs, shots=shots).result().results[1::3]]
-                else:
-                    raw_counts = [result.data.counts for result in backend.run(bound_circs, shots=shots).result().results[1::2]]
-                counts = []
-                for raw_count in raw_counts:
-                    count = {}
-                    for key, value in raw_count.items():
-                        key = bin(int(key, 16))[2:]
-                        while(len(key) < num_qubits):
-                            key = "0" + key
-                        count[key] = value
-                    counts.append(count)
+                results = run_circuits(backend, bound_circs, block_size=len(layout), shots=shots).results
+                counts = decode_counts([results[i].data.counts for i in positions], num_qubits, decoded_keys)
             else:
-                counts = backend.run(bound_circs, shots=shots).result().get_counts()
+                result = run_circuits(backend, bound_circs, block_size=len(layout), shots=shots)
+                counts = [result.get_counts(i) for i in positions]
         else:
-            if state_prep_circ:
-                if add_delay_after_meas:
-                    counts = backend.run(bound_circs, shots=shots, rep_delay = rep_delay, init_qubits = init_qubits).result().get_counts()[1::3]
-                else:
-                    counts = backend.run(bound_circs, shots=shots, rep_delay = rep_delay, init_qubits = init_qubits).result().get_counts()[1::2]
-            else:
-                counts = backend.run(bound_circs, shots=shots, rep_delay = rep_delay, init_qubits = init_qubits).result().get_counts()
+            result = run_circuits(backend, bound_circs, block_size=len(layout), shots=shots, rep_delay = rep_delay, init_qubits = init_qubits)
+            counts = [result.get_counts(i) for i in positions]
 
-        # If using measurement mitigation apply the correction and
-        # compute expectation values from the resultant quasiprobabilities
-        # using the measurement strings.
-        if use_measurement_mitigation:
-            quasi_collection = mit.apply_correction(counts, maps)
-            expvals = quasi_collection.expval(meas_strings)
-        # If not doing any mitigation just compute expectation values
-        # from the raw counts using the measurement strings.
+        # If using measurement mitigation apply the correction, once per measurement
+        # basis, and compute expectation values from the resultant quasiprobabilities.
+        # If not doing any mitigation just compute expectation values from the raw counts.
         # Since Qiskit does not have such functionality we use the convenence
         # function from the mthree mitigation module.
+        num_vectors = len(params_list)
+        if use_measurement_mitigation:
+            dists = mit.apply_correction(counts, maps * num_vectors)
         else:
-            expvals = mthree.utils.expval(counts, meas_strings)
+            dists = counts
+        # Every term is evaluated on the distribution of its group's basis, using
+        # its own measurement string.
+        term_dists = [
+            dists[block * len(meas_bases) + group] for block in range(num_vectors) for group in term_groups
+        ]
+        expvals = mthree.utils.expval(term_dists, meas_strings * num_vectors)
 
         # The energy is computed by simply taking the product of the coefficients
         # and the computed expectation values and summing them. Here we also
         # take just the real part as the coefficients can possibly be complex,
         # but the energy (eigenvalue) of a Hamiltonian is always real.
-        energy = np.sum(coeffs * expvals).real
-        return energy
+        expvals = np.asarray(expvals).reshape(num_vectors, len(meas_strings))
+        energies = np.sum(coeffs * expvals, axis=1).real
+        return energies
+
+    # Single-vector objective, for the SciPy optimizers.
+    def vqe_func(params):
+        return vqe_batch_func([params])[0]
 
     # Here is where we actually perform the computation.  We begin by seeing what
     # optimization routine the user has requested, eg. SPSA verses SciPy ones,
@@ -250,12 +346,18 @@ def main(
     # meas_strings = [meas_string[::-1] for meas_string in meas_strings]
     # Since SPSA is not in SciPy need if statement
     if optimizer == "SPSA":
-        res = fmin_spsa(vqe_func, initial_parameters, args=(), **optimizer_config, callback=publisher.callback)
+        res = fmin_spsa(vqe_func, initial_parameters, args=(), **optimizer_config, callback=publisher.callback, batch_func=vqe_batch_func)
     # All other SciPy optimizers here
     else:
         res = opt.minimize(
             vqe_func, initial_parameters, method=optimizer, options=optimizer_config, callback=publisher.callback
         )
+    if use_measurement_mitigation:
+        res.mitigation_cals = {
+            qubit: {"cal": np.asarray(cals[qubit]["cal"]).tolist(), "timestamp": cals[qubit]["timestamp"]}
+            for qubit in qubits
+            if qubit in cals
+        }
     # Return result. OptimizeResult is a subclass of dict.
     return res
 
@@ -275,6 +377,9 @@ def fmin_spsa(
     c=1.0,
     gamma=0.101,
     callback=None,
+    batch_func=None,
+    num_perturbations=1,
+    evaluate_value=True,
 ):
     """
     Minimization of scalar function of one or more variables using simultaneous
@@ -306,6 +411,19 @@ def fmin_spsa(
         callback (callable): Function that accepts the current parameter vector
                              as input.
 
+        batch_func (callable): Optional batched objective,
+                               ``batch_func(list_of_x, *args) -> array of floats``.
+                               When given, all the evaluations of an iteration (every
+                               perturbation pair, and the value of the previous step's
+                               parameters for the callback) are made in one call.
+
+        num_perturbations (int): Number of random perturbations whose gradient
+                                 estimates are averaged in each iteration. Optional.
+
+        evaluate_value (bool): Evaluate the objective at every step's parameters for
+                               the callback. If False, the callback gets None as value
+                               and only the final value is evaluated. Optional.
+
     Returns:
         OptimizeResult: Solution in SciPy Optimization format.
 
@@ -316,36 +434,283 @@ def fmin_spsa(
     A = 0.01 * maxiter
     x0 = np.asarray(x0)
     x = x0
+    nfev = 0
+
+    if batch_func is None:
+        def batch_func(xs, *args):
+            return np.array([func(xk, *args) for xk in xs])
 
     for step, kk in enumerate(range(maxiter)):
         ak = a * (kk + 1.0 + A) ** -alpha
         ck = c * (kk + 1.0) ** -gamma
         # Bernoulli distribution for randoms
-        deltak = 2 * np.random.randint(2, size=x.shape[0]) - 1
-        grad = (func(x + ck * deltak, *args) - func(x - ck * deltak, *args)) / (
-            2 * ck * deltak
-        )
-        x -= ak * grad
-
-        # if callback is not None:
-        #     callback(step, func, x)
-        
-        value = func(x, *args)
-        if callback is not None:
-            callback(step, x, value)
-
+        deltas = 2 * np.random.randint(2, size=(num_perturbations, x.shape[0])) - 1
+        points = [xk for deltak in deltas for xk in (x + ck * deltak, x - ck * deltak)]
+        # The value at the parameters of the previous step rides along with this step's perturbations.
+        probe = evaluate_value and step > 0
+        if probe:
+            points.append(x)
+        values = batch_func(points, *args)
+        nfev += len(points)
+
+        if probe and callback is not None:
+            callback(step - 1, x, values[-1])
+        grad = np.mean([
+            (values[2 * i] - values[2 * i + 1]) / (2 * ck * deltak) for i, deltak in enumerate(deltas)
+        ], axis=0)
+        x = x - ak * grad
+
+        if not evaluate_value and callback is not None:
+            callback(step, x, None)
+
+    value = batch_func([x], *args)[0]
+    nfev += 1
+    if evaluate_value and callback is not None and maxiter > 0:
+        callback(maxiter - 1, x, value)
 
     return OptimizeResult(
-        fun=func(x, *args),
+        fun=value,
         x=x,
         nit=maxiter,
-        nfev=2 * maxiter,
+        nfev=nfev,
         message="Optimization terminated successfully.",
         success=True,
     )
 
 
 
+def run_circuits(backend, circuits, block_size=1, **run_options):
+    """Run circuits in as few jobs as the backend allows and return one merged Result.
+
+    Circuits are split into jobs on multiples of block_size, so a block, e.g. the
+    [state_prep, ansatz(, delay)] circuits of one measurement basis, always runs in one job.
+    All jobs are submitted before any result is collected.
+
+    Parameters:
+        backend (Backend): Backend to run on.
+        circuits (list): Circuits to run.
+        block_size (int): Number of consecutive circuits that must run in the same job.
+        run_options: Keyword arguments of backend.run().
+
+    Returns:
+        Result: Result with the experiment results of all circuits, in order.
+
+    Raises:
+        ValueError: If a block is larger than the backend's max_experiments.
+    """
+    max_experiments = getattr(backend.configuration(), "max_experiments", None) or len(circuits)
+    if block_size > max_experiments:
+        raise ValueError(
+            "A block of {} circuits does not fit in a job of at most {} experiments.".format(block_size, max_experiments)
+        )
+    chunk_size = max_experiments - max_experiments % block_size
+    jobs = [
+        backend.run(circuits[start:start + chunk_size], **run_options)
+        for start in range(0, len(circuits), chunk_size)
+    ]
+    results = [job.result() for job in jobs]
+    result = results[0]
+    for other in results[1:]:
+        result.results.extend(other.results)
+    return result
+
+
+
+def parametric_slots(template, parameters):
+    """Locate the parametrized gate arguments of a transpiled template, for bind_template().
+
+    Transpiled arguments are nearly always linear in a single parameter (e.g. theta + pi),
+    so they are stored as offset + scale * value and computed for all gates at once;
+    any other expression is bound symbolically.
+
+    Parameters:
+        template (QuantumCircuit): Transpiled parametric circuit.
+        parameters (list): Parameters in the order of the value vectors, e.g. ansatz_circ.parameters.
+
+    Returns:
+        dict: Gate positions and coefficients of the arguments, and the general expressions.
+    """
+    index = {parameter: i for i, parameter in enumerate(parameters)}
+    slots = {"parameters": list(parameters), "gates": [], "args": [], "positions": [], "offsets": [], "scales": [], "general": []}
+    for gate_index, instruction in enumerate(template.data):
+        for arg_index, value in enumerate(instruction.operation.params):
+            if not isinstance(value, ParameterExpression):
+                continue
+            position, offset, scale = 0, 0.0, 0.0
+            if len(value.parameters) == 1:
+                (parameter,) = value.parameters
+                gradient = value.gradient(parameter)
+                if isinstance(gradient, (int, float)):
+                    position, offset, scale = index[parameter], float(value.bind({parameter: 0})), float(gradient)
+                else:
+                    slots["general"].append((len(slots["gates"]), value))
+            else:
+                slots["general"].append((len(slots["gates"]), value))
+            slots["gates"].append(gate_index)
+            slots["args"].append(arg_index)
+            slots["positions"].append(position)
+            slots["offsets"].append(offset)
+            slots["scales"].append(scale)
+    for key in ("positions", "offsets", "scales"):
+        slots[key] = np.asarray(slots[key])
+    slots["global_phase"] = template.global_phase if isinstance(template.global_phase, ParameterExpression) else None
+    return slots
+
+
+def bind_template(template, slots, values):
+    """Bind a parameter vector to a transpiled template.
+
+    Only the parametrized gates are copied; the other instructions are shared with the
+    template, which makes this several times faster than template.bind_parameters(values).
+    Without FAST_BIND, the template is bound with assign_parameters().
+
+    Parameters:
+        template (QuantumCircuit): Transpiled parametric circuit.
+        slots (dict): parametric_slots() of the template.
+        values (array_like): Parameter values, in the order of slots["parameters"].
+
+    Returns:
+        QuantumCircuit: The bound circuit.
+    """
+    values = np.asarray(values, dtype=float)
+    if not FAST_BIND:
+        return template.assign_parameters(dict(zip(slots["parameters"], values.tolist())))
+    arguments = (slots["offsets"] + slots["scales"] * values[slots["positions"]]).tolist()
+    if slots["general"] or slots["global_phase"] is not None:
+        bindings = dict(zip(slots["parameters"], values.tolist()))
+    for k, expression in slots["general"]:
+        arguments[k] = float(expression.bind({parameter: bindings[parameter] for parameter in expression.parameters}))
+
+    data = list(template.data)
+    for gate_index, arg_index, argument in zip(slots["gates"], slots["args"], arguments):
+        instruction = data[gate_index]
+        operation = instruction.operation.copy()
+        params = list(operation.params)
+        params[arg_index] = argument
+        operation.params = params
+        data[gate_index] = instruction.replace(operation=operation)
+
+    global_phase = template.global_phase
+    if slots["global_phase"] is not None:
+        global_phase = float(global_phase.bind({parameter: bindings[parameter] for parameter in global_phase.parameters}))
+    bound = QuantumCircuit(
+        *template.qregs, *template.cregs, name=template.name, global_phase=global_phase, metadata=template.metadata
+    )
+    bound.calibrations = {gate: dict(schedules) for gate, schedules in template.calibrations.items()}
+    for instruction in data:
+        bound._append(instruction)
+    return bound
+
+
+
+def load_mitigation_cals(filename, max_age=None):
+    """Load the single-qubit mitigation calibrations of a cache file.
+
+    A cache file holds the calibrations of one backend and number of calibration
+    shots: {qubit: {"cal": 2x2 matrix, "timestamp": unix time}}.
+
+    Parameters:
+        filename (str): Cache file, e.g. <cache_dir>/<backend_name>_<shots>.json.
+        max_age (float): Leave out calibrations older than this many seconds.
+
+    Returns:
+        dict: {qubit: {"cal": ndarray, "timestamp": float}}, empty if there is no file.
+    """
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename, "r") as f:
+        entries = json.load(f)
+    now = time.time()
+    return {
+        int(qubit): {"cal": np.asarray(entry["cal"], dtype=float), "timestamp": entry["timestamp"]}
+        for qubit, entry in entries.items()
+        if entry.get("cal") is not None and (max_age is None or now - entry["timestamp"] <= max_age)
+    }
+
+
+def save_mitigation_cals(filename, cals):
+    """Add calibrations, {qubit: {"cal": matrix, "timestamp": unix time}}, to a cache file.
+
+    Entries without a calibration matrix (cal None) are not written. The file is rewritten with the other qubits' entries and then renamed into place,
+    so a concurrent run never reads a partial file.
+    """
+    entries = {}
+    if os.path.isfile(filename):
+        with open(filename, "r") as f:
+            entries = json.load(f)
+    for qubit, entry in cals.items():
+        if entry["cal"] is None:
+            continue
+        entries[str(qubit)] = {"cal": np.asarray(entry["cal"]).tolist(), "timestamp": entry["timestamp"]}
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    tmp_filename = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmp_filename, "w") as f:
+        json.dump(entries, f)
+    os.replace(tmp_filename, filename)
+
+
+
+def decode_counts(raw_counts, num_qubits, cache=None):
+    """Convert hexadecimal count keys to bitstrings zero-padded to num_qubits bits.
+
+    Keys not in the cache are converted in one vectorized step and added to it; all others
+    come from the cache.
+
+    Parameters:
+        raw_counts (list): List of counts dictionaries with hexadecimal keys, e.g. result.data.counts.
+        num_qubits (int): Minimum width of the bitstrings.
+        cache (dict): Optional, {(hex key, num_qubits): bitstring} kept between calls, e.g. one per
+                      VQE run, where it is bounded by the 2^n outcomes of the measured qubits.
+
+    Returns:
+        list: List of counts dictionaries with bitstring keys.
+    """
+    if cache is None:
+        cache = {}
+    missing = list({key for raw_count in raw_counts for key in raw_count if (key, num_qubits) not in cache})
+    if missing:
+        values = [int(key, 16) for key in missing]
+        widths = np.maximum([value.bit_length() for value in values], num_qubits)
+        width = int(widths.max())
+        dtype = np.int64 if width < 64 else object
+        bits = (np.array(values, dtype=dtype)[:, None] >> np.arange(width - 1, -1, -1, dtype=dtype)) & 1
+        chars = (bits.astype(np.uint8) + ord("0")).view("S%d" % width).ravel()
+        for key, string, key_width in zip(missing, chars, widths):
+            cache[(key, num_qubits)] = string.decode()[width - key_width:]
+    return [{cache[(key, num_qubits)]: value for key, value in raw_count.items()} for raw_count in raw_counts]
+
+
+
+def group_qubitwise_commuting(op_strings):
+    """Greedily group operator strings that commute qubit-wise into shared measurement bases.
+
+    Terms are placed heaviest first, each into the first group it commutes with qubit-wise,
+    i.e. on every qubit either one of them is "I" or both have the same Pauli.
+
+    Parameters:
+        op_strings (list): List of Pauli strings, e.g. ["ZZII", "XXII"].
+
+    Returns:
+        list: Measurement basis of every group, as Pauli strings for opstr_to_meas_circ().
+        list: Index of the group of every operator string.
+    """
+    bases = []
+    groups = [None] * len(op_strings)
+    order = sorted(range(len(op_strings)), key=lambda k: -sum(item != "I" for item in op_strings[k]))
+    for k in order:
+        op = op_strings[k]
+        for group, basis in enumerate(bases):
+            if all(a == b or a == "I" or b == "I" for a, b in zip(op, basis)):
+                bases[group] = "".join(b if a == "I" else a for a, b in zip(op, basis))
+                groups[k] = group
+                break
+        else:
+            groups[k] = len(bases)
+            bases.append(op)
+    return bases, groups
+
+
+
 def opstr_to_meas_circ(op_str):
     """Takes a list of operator strings and makes circuit with the correct post-rotations for measurements.
 
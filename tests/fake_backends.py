@@ -0,0 +1,45 @@
+"""Fake backends shared by the tests and benchmarks/bench_submission.py; they need no qiskit."""
+import itertools
+import threading
+import time
+
+
+class FakeJobLimitError(Exception):
+    pass
+
+
+class FakeJob:
+    def __init__(self, job_id):
+        self._job_id = job_id
+
+    def job_id(self):
+        return self._job_id
+
+
+class LatencyBackend:
+    """Backend stand-in whose run() takes `latency` seconds and accepts `capacity` calls at once.
+
+    Calls beyond its concurrent capacity are rejected with a job-limit error, as the IBM Quantum
+    providers do when too many jobs are queued.
+    """
+
+    def __init__(self, latency = 0.05, capacity = 8):
+        self.latency = latency
+        self.capacity = capacity
+        self.rejected = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+
+    def run(self, circ, **run_options):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                raise FakeJobLimitError("Job limit reached.")
+            self._in_flight += 1
+        try:
+            time.sleep(self.latency)
+            return FakeJob(f"fake-{next(self._ids)}")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+pytest.importorskip('qiskit')
+from qiskit import QuantumCircuit
+from qiskit.providers.fake_provider import FakeLagos
+
+from utils.cache_utils import TranspileCache, circuit_key
+
+
+def build_circ():
+    circ = QuantumCircuit(3, 3)
+    circ.h(0)
+    circ.cx(0, 1)
+    circ.x(2)
+    circ.measure(range(3), range(3))
+    return circ
+
+
+
+def test_identically_built_circuits_share_a_key():
+    first, second = build_circ(), build_circ()
+    second.metadata = {"state": 3}
+    assert first.name != second.name
+    assert circuit_key(first) == circuit_key(second)
+
+    different = build_circ()
+    different.x(0)
+    assert circuit_key(different) != circuit_key(first)
+
+
+
+def test_rebuilt_circuits_hit_memory_and_disk(tmp_path):
+    backend = FakeLagos()
+    cache = TranspileCache(cache_dir = str(tmp_path))
+    first = cache.transpile(build_circ(), backend, optimization_level = 0)
+    assert cache.stats()["misses"] == 1
+
+    rebuilt = build_circ()
+    rebuilt.metadata = {"point": 1}
+    second = cache.transpile(rebuilt, backend, optimization_level = 0)
+    assert cache.stats()["hits"] == 1
+    assert second == first
+    assert second.name == rebuilt.name and second.metadata == {"point": 1}
+
+    # a new session only has the disk tier
+    other_session = TranspileCache(cache_dir = str(tmp_path))
+    other_session.transpile(build_circ(), backend, optimization_level = 0)
+    assert other_session.stats()["disk_hits"] == 1 and other_session.stats()["misses"] == 0
+
+
+
+def test_concurrent_use():
+    backend = FakeLagos()
+    cache = TranspileCache(max_size = 4)
+    circs = []
+    for k in range(8):
+        circ = QuantumCircuit(2, 2)
+        for _ in range(k):
+            circ.x(0)
+        circ.measure([0, 1], [0, 1])
+        circs.append(circ)
+    errors = []
+
+    def work():
+        try:
+            for _ in range(5):
+                cache.transpile(circs, backend, optimization_level = 0)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target = work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert cache.stats()["size"] <= 4
+
+
+
+def test_backend_hash_memo_does_not_keep_backends_alive():
+    import gc
+    import weakref
+
+    from utils.cache_utils import _backend_keys, backend_key
+
+    backend = FakeLagos()
+    key = backend_key(backend)
+    assert backend_key(backend) == key and backend in _backend_keys
+    ref = weakref.ref(backend)
+    del backend
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,70 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from tests.fake_backends import LatencyBackend
+from utils.experiment_utils import SubmissionError, run_exp, run_sweep, submit_jobs
+from utils.result_utils import load_job_ids
+
+
+class FailingBackend(LatencyBackend):
+    """LatencyBackend whose `fail_at`-th run() call fails with a non-retryable error; records accepted job ids."""
+
+    def __init__(self, fail_at, latency = 0.01, capacity = 4):
+        super().__init__(latency, capacity)
+        self.fail_at = fail_at
+        self.accepted = []
+        self._calls = 0
+        self._calls_lock = threading.Lock()
+
+    def configuration(self):
+        return SimpleNamespace(max_experiments = 1)
+
+    def run(self, circ, **run_options):
+        with self._calls_lock:
+            self._calls += 1
+            call = self._calls
+        if call == self.fail_at:
+            raise RuntimeError("Invalid circuit.")
+        job = super().run(circ, **run_options)
+        with self._calls_lock:
+            self.accepted.append(job.job_id())
+        return job
+
+
+
+def test_submit_jobs_retries_job_limit_errors():
+    backend = LatencyBackend(latency = 0.01, capacity = 2)
+    jobs = dict(submit_jobs(list(range(12)), backend, max_workers = 6, backoff = 0.01))
+    assert sorted(jobs) == list(range(12))
+    assert len({job.job_id() for job in jobs.values()}) == 12
+    assert backend.rejected > 0
+
+
+
+@pytest.mark.parametrize('max_workers', [1, 4])
+def test_run_exp_keeps_accepted_job_ids_on_failure(max_workers):
+    backend = FailingBackend(fail_at = 3)
+    with pytest.raises(SubmissionError) as info:
+        run_exp(None, 8, backend, max_workers = max_workers)
+    job_ids = info.value.job_ids
+    assert len(job_ids) == 8
+    assert sorted(job_id for job_id in job_ids if job_id is not None) == sorted(backend.accepted)
+    assert len(backend.accepted) >= 2
+    assert isinstance(info.value.__cause__, RuntimeError)
+
+
+
+def test_run_exp_reraises_when_nothing_was_accepted():
+    with pytest.raises(RuntimeError, match = 'Invalid circuit'):
+        run_exp(None, 3, FailingBackend(fail_at = 1))
+
+
+
+def test_run_sweep_journals_accepted_job_ids_on_failure(tmp_path):
+    backend = FailingBackend(fail_at = 4)
+    sweep = {k: f'circuit-{k}' for k in range(6)}
+    with pytest.raises(SubmissionError):
+        run_sweep(sweep, backend, max_workers = 3, dirname = str(tmp_path), filename = 'jobs.jsonl')
+    assert sorted(load_job_ids(str(tmp_path), 'jobs.jsonl')) == sorted(backend.accepted)
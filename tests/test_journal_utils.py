@@ -0,0 +1,86 @@
+import json
+import os
+
+from utils.experiment_utils import dump_job_ids
+from utils.journal_utils import _INDEX_RECORD, append_job_ids, import_json_job_ids, query_job_ids, tail_job_ids
+from utils.result_utils import load_job_ids
+
+
+def test_tail_reads_back_appends(tmp_path):
+    filename = str(tmp_path / 'jobs.jsonl')
+    for k in range(5):
+        append_job_ids([f'job-{k}-{i}' for i in range(3)], [0, 1], filename)
+    append_job_ids(['other'], [5, 6], filename)
+
+    assert tail_job_ids(filename, 4) == ['job-4-0', 'job-4-1', 'job-4-2', 'other']
+    assert tail_job_ids(filename, 4, qubit_layout = [0, 1]) == ['job-3-2', 'job-4-0', 'job-4-1', 'job-4-2']
+    assert len(tail_job_ids(filename)) == 16
+    assert os.path.getsize(filename + '.idx') == 6 * _INDEX_RECORD.size
+
+
+
+def test_tail_across_index_blocks(tmp_path):
+    from utils.journal_utils import _index_newest_first
+
+    filename = str(tmp_path / 'jobs.jsonl')
+    for k in range(7):
+        append_job_ids([f'job-{k}'], [0], filename)
+    with open(filename, 'rb') as f:
+        offsets = [entry[0] for entry in _index_newest_first(filename, f, block_size = 3)]
+    assert offsets == sorted(offsets, reverse = True) and len(offsets) == 7
+
+
+
+def test_num_zero_matches_json(tmp_path):
+    dump_job_ids(['a', 'b'], [0], dirname = str(tmp_path), filename = 'jobs.json')
+    dump_job_ids(['a', 'b'], [0], dirname = str(tmp_path), filename = 'jobs.jsonl')
+    assert load_job_ids(str(tmp_path), 'jobs.jsonl', num = 0) == load_job_ids(str(tmp_path), 'jobs.json', num = 0) == ['a', 'b']
+
+
+
+def test_torn_index_and_unindexed_lines_are_repaired(tmp_path):
+    filename = str(tmp_path / 'jobs.jsonl')
+    append_job_ids(['a'], [0], filename)
+    append_job_ids(['b'], [0], filename)
+    # crash after the journal write of an append, with a torn index record
+    with open(filename, 'ab') as f:
+        f.write((json.dumps({"timestamp": 0, "qubit_layout": [0], "num_jobs": 1, "job_ids": ['c']}) + '\n').encode())
+    with open(filename + '.idx', 'ab') as idx:
+        idx.write(b'\x00' * 5)
+
+    assert tail_job_ids(filename) == ['a', 'b', 'c']
+    append_job_ids(['d'], [0], filename)
+    assert os.path.getsize(filename + '.idx') == 4 * _INDEX_RECORD.size
+    assert tail_job_ids(filename, 2) == ['c', 'd']
+    assert [record["job_ids"] for record in query_job_ids(filename, qubit_layout = [0])] == [['a'], ['b'], ['c'], ['d']]
+
+
+
+def test_mismatched_index_is_rebuilt(tmp_path):
+    filename = str(tmp_path / 'jobs.jsonl')
+    for job_id in 'abc':
+        append_job_ids([job_id], [0], filename)
+    # journal replaced by a shorter one, index left behind
+    with open(filename, 'wb') as f:
+        f.write((json.dumps({"timestamp": 0, "qubit_layout": [0], "num_jobs": 1, "job_ids": ['x']}) + '\n').encode())
+
+    assert tail_job_ids(filename) == ['x']
+    append_job_ids(['y'], [0], filename)
+    assert tail_job_ids(filename) == ['x', 'y']
+    assert os.path.getsize(filename + '.idx') == 2 * _INDEX_RECORD.size
+
+
+
+def test_mode_w_truncates_under_the_lock(tmp_path):
+    dump_job_ids(['a', 'b'], [0], dirname = str(tmp_path), filename = 'jobs.jsonl')
+    dump_job_ids(['c'], [0], dirname = str(tmp_path), filename = 'jobs.jsonl', mode = 'w')
+    assert load_job_ids(str(tmp_path), 'jobs.jsonl') == ['c']
+    assert os.path.getsize(str(tmp_path / 'jobs.jsonl.idx')) == _INDEX_RECORD.size
+
+
+
+def test_import_json(tmp_path):
+    dump_job_ids(['a', 'b'], [0], dirname = str(tmp_path), filename = 'jobs.json')
+    dump_job_ids(['c'], [0], dirname = str(tmp_path), filename = 'jobs.json')
+    assert import_json_job_ids(str(tmp_path / 'jobs.json'), str(tmp_path / 'jobs.jsonl')) == 2
+    assert tail_job_ids(str(tmp_path / 'jobs.jsonl')) == ['a', 'b', 'c']
@@ -0,0 +1,15 @@
+import numpy as np
+
+from utils.leakage_utils import channel_metrics
+
+
+def test_callers_do_not_share_cached_arrays(tmp_path):
+    channels = np.array([[[[0.9, 0.1], [0.2, 0.8]], [[0.6, 0.4], [0.5, 0.5]]]])
+    first = channel_metrics(channels, cache_dir = str(tmp_path))
+    expected = {name: value.copy() for name, value in first.items()}
+    first["capacity"] /= first["capacity"].max()
+    first["leakage"][:] = 0
+
+    for metrics in (channel_metrics(channels), channel_metrics(channels, cache_dir = str(tmp_path))):
+        for name, value in expected.items():
+            np.testing.assert_array_equal(metrics[name], value)
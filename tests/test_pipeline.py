@@ -0,0 +1,92 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from utils.pipeline import Pipeline
+
+
+class FakeJob:
+    def __init__(self, job_id, circs):
+        self._job_id = job_id
+        self.circs = circs
+
+    def job_id(self):
+        return self._job_id
+
+    def result(self):
+        return self.circs
+
+
+class FlakyBackend:
+    """Hardware-like backend (jobs outlive the process) whose run() fails on the calls in `fail_at`."""
+
+    def __init__(self, fail_at = ()):
+        self.fail_at = set(fail_at)
+        self.jobs = {}
+        self._calls = itertools.count(1)
+
+    def configuration(self):
+        return SimpleNamespace(simulator = False, max_experiments = 2, backend_name = 'flaky')
+
+    def run(self, circs, **run_options):
+        if next(self._calls) in self.fail_at:
+            raise RuntimeError("Connection reset.")
+        job = FakeJob(f"job-{len(self.jobs)}-{id(self)}", circs)
+        self.jobs[job.job_id()] = job
+        return job
+
+    def retrieve_job(self, job_id):
+        return self.jobs[job_id]
+
+
+
+def pipeline_of(dirname, backend):
+    pipeline = Pipeline(dirname, backend, max_workers = 1)
+    pipeline.add_experiment('exp', lambda backend: {k: f'circuit-{k}' for k in range(10)})
+    return pipeline
+
+
+
+def test_resumed_submit_only_submits_missing_jobs(tmp_path):
+    first = FlakyBackend(fail_at = [3])
+    with pytest.raises(Exception):
+        pipeline_of(str(tmp_path), first).run(['exp.submit'])
+    assert len(first.jobs) == 2
+
+    second = FlakyBackend()
+    second.jobs.update(first.jobs)
+    submitted = pipeline_of(str(tmp_path), second).run(['exp.submit'])['exp.submit']
+    assert len(second.jobs) == 5
+    assert len(set(submitted["job_ids"])) == 5
+    assert set(submitted["job_ids"]) == set(second.jobs)
+    # every sweep point is in exactly one job
+    assert sorted(circ for job_id in submitted["job_ids"] for circ in second.jobs[job_id].circs) == sorted(f'circuit-{k}' for k in range(10))
+
+
+
+def test_torn_partial_line_is_dropped(tmp_path):
+    first = FlakyBackend(fail_at = [2])
+    pipeline = pipeline_of(str(tmp_path), first)
+    with pytest.raises(Exception):
+        pipeline.run(['exp.submit'])
+    with open(pipeline.partial_file('exp.submit'), 'a') as f:
+        f.write('{"position": 4, "job_')
+
+    second = FlakyBackend()
+    second.jobs.update(first.jobs)
+    submitted = pipeline_of(str(tmp_path), second).run(['exp.submit'])['exp.submit']
+    assert len(second.jobs) == 5 and None not in submitted["job_ids"]
+
+
+
+def test_redo_forgets_submitted_jobs(tmp_path):
+    first = FlakyBackend(fail_at = [2])
+    pipeline = pipeline_of(str(tmp_path), first)
+    with pytest.raises(Exception):
+        pipeline.run(['exp.submit'])
+    pipeline.redo('exp.submit')
+
+    second = FlakyBackend()
+    pipeline_of(str(tmp_path), second).run(['exp.submit'])
+    assert len(second.jobs) == 5
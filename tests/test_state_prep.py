@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip('qiskit')
+from utils.higher_energy_states import gen_circ, gen_circ_sweep
+
+
+def test_empty_num_reset_list_builds_no_circuits():
+    assert gen_circ_sweep([0, 1], 3, [0, 1, 2], num_reset_list = []) == [[], []]
+    assert gen_circ_sweep([0, 1], 3, [0, 1, 2], num_reset_list = [], delay_list = [100]) == [[], []]
+
+
+
+def test_sweep_matches_gen_circ():
+    circs = gen_circ_sweep([0, 1], 3, [0, 2], num_reset_list = [0, 2])
+    for state_idx, state in enumerate([0, 1]):
+        for reset_idx, num_reset in enumerate([0, 2]):
+            expected = gen_circ(state, 3, [0, 2], num_reset = num_reset)
+            assert [instruction.operation.name for instruction in circs[state_idx][reset_idx].data] == \
+                   [instruction.operation.name for instruction in expected.data]
@@ -0,0 +1,90 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('mthree')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'experiments', '3-attack_on_quantum_algorithms', 'vqe'))
+import vqe_custom
+from vqe_custom import decode_counts, fmin_spsa, run_circuits
+
+
+class RecordingBackend:
+    """Backend whose jobs return their circuits as results; records every run() and result() call."""
+
+    def __init__(self, max_experiments):
+        self.max_experiments = max_experiments
+        self.calls = []
+
+    def configuration(self):
+        return SimpleNamespace(max_experiments = self.max_experiments)
+
+    def run(self, circs, **run_options):
+        self.calls.append(('run', list(circs)))
+        calls = self.calls
+
+        class Job:
+            def result(self):
+                calls.append(('result', list(circs)))
+                return SimpleNamespace(results = list(circs))
+        return Job()
+
+
+
+def test_run_circuits_never_splits_a_block():
+    backend = RecordingBackend(max_experiments = 5)
+    circuits = list(range(9))
+    assert run_circuits(backend, circuits, block_size = 3).results == circuits
+    assert [circs for call, circs in backend.calls if call == 'run'] == [[0, 1, 2], [3, 4, 5], [6, 7, 8]]
+    # every job is submitted before the first result is collected
+    assert [call for call, _ in backend.calls] == ['run'] * 3 + ['result'] * 3
+
+
+
+def test_run_circuits_rejects_a_block_larger_than_a_job():
+    with pytest.raises(ValueError):
+        run_circuits(RecordingBackend(max_experiments = 2), list(range(6)), block_size = 3)
+
+
+
+def test_spsa_without_iterations_does_not_call_back():
+    steps = []
+    result = fmin_spsa(lambda x: float(sum(x)), [1.0, 2.0], maxiter = 0, callback = lambda step, x, value: steps.append(step))
+    assert steps == [] and result.fun == 3.0
+
+
+
+def test_decode_counts_caches_only_in_the_given_dict():
+    cache = {}
+    assert decode_counts([{'0x3': 5, '0x0': 1}], 4, cache) == [{'0011': 5, '0000': 1}]
+    assert cache == {('0x3', 4): '0011', ('0x0', 4): '0000'}
+    assert decode_counts([{'0x3': 2}], 2) == [{'11': 2}]
+    assert not hasattr(vqe_custom, '_decoded_keys')
+
+
+
+@pytest.mark.parametrize('fast_bind', [True, False])
+def test_bind_template_matches_assign_parameters(monkeypatch, fast_bind):
+    from qiskit import pulse, transpile
+    from qiskit.circuit import Gate
+    from qiskit.circuit.library import TwoLocal
+    from qiskit.providers.fake_provider import FakeLagos
+
+    backend = FakeLagos()
+    ansatz = TwoLocal(2, 'ry', 'cx', reps = 1)
+    circ = ansatz.decompose()
+    circ.append(Gate('x12_gate', 1, []), [0])
+    with pulse.build(backend) as x12_sched:
+        pulse.play(pulse.Constant(160, 0.1), pulse.DriveChannel(0))
+    circ.add_calibration('x12_gate', (0, ), x12_sched)
+    circ.measure_all()
+    template = transpile(circ, backend, optimization_level = 0)
+    slots = vqe_custom.parametric_slots(template, ansatz.parameters)
+
+    monkeypatch.setattr(vqe_custom, 'FAST_BIND', fast_bind)
+    values = [0.1, 0.2, 0.3, 0.4]
+    bound = vqe_custom.bind_template(template, slots, values)
+    assert bound == template.assign_parameters(dict(zip(ansatz.parameters, values)))
+    bound.calibrations['x12_gate'][((1, ), ())] = x12_sched
+    assert ((1, ), ()) not in template.calibrations['x12_gate']
@@ -1,10 +1,121 @@
+from collections import deque
+
+import numpy as np
+
+# backend id -> (backend, CouplingIndex); the backend is kept so its id is not reused
+_coupling_indexes = {}
+
+
+class CouplingIndex:
+    """Coupling graph of a backend, indexed once for adjacency, distance and pair-selection queries.
+
+    Attributes:
+        num_qubits (int): Number of qubits.
+        edges (np.ndarray): (num_edges, 2) undirected edges, one row per coupled qubit pair, smaller qubit first.
+        adjacency (list): adjacency[q] is the set of qubits coupled to q, in either direction.
+        directed (np.ndarray): (num_qubits, num_qubits) bool, directed[i, j] if [i, j] is in the coupling map.
+        distance (np.ndarray): (num_qubits, num_qubits) hop distance, -1 between disconnected qubits.
+    """
+
+    def __init__(self, coupling_map, num_qubits):
+        self.num_qubits = num_qubits
+        self.directed = np.zeros((num_qubits, num_qubits), dtype = bool)
+        if len(coupling_map):
+            coupling_map = np.asarray(coupling_map)
+            self.directed[coupling_map[:, 0], coupling_map[:, 1]] = True
+        self.undirected = self.directed | self.directed.T
+        self.edges = np.argwhere(np.triu(self.undirected))
+        self.adjacency = [set(np.flatnonzero(row).tolist()) for row in self.undirected]
+
+        self.distance = np.full((num_qubits, num_qubits), -1, dtype = np.int64)
+        for source in range(num_qubits):
+            self.distance[source, source] = 0
+            queue = deque([source])
+            while queue:
+                node = queue.popleft()
+                for neighbour in self.adjacency[node]:
+                    if self.distance[source, neighbour] < 0:
+                        self.distance[source, neighbour] = self.distance[source, node] + 1
+                        queue.append(neighbour)
+
+
+
+    def neighbourhood(self, qubit, radius = 1):
+        """Return the qubits at 1 to `radius` hops from `qubit`."""
+        row = self.distance[qubit]
+        return set(np.flatnonzero((row > 0) & (row <= radius)).tolist())
+
+
+
+    def is_adjacent(self, qubits_one, qubits_two, directed = False):
+        """Batched adjacency of qubit groups.
+
+        Args:
+            qubits_one, qubits_two (list): Two qubit groups (e.g. pairs), or two equally long lists of groups.
+            directed (bool): Only count couplings [i, j] of the coupling map with i in
+                             qubits_one and j in qubits_two.
+        Return:
+            bool or np.ndarray: Whether any qubit of the first group is coupled to any qubit of the second,
+                                per pair of groups.
+        """
+        one, two = np.asarray(qubits_one), np.asarray(qubits_two)
+        single = one.ndim == 1
+        one, two = np.atleast_2d(one), np.atleast_2d(two)
+        matrix = self.directed if directed else self.undirected
+        adjacent = matrix[one[:, :, None], two[:, None, :]].any(axis = (1, 2))
+        return bool(adjacent[0]) if single else adjacent
+
+
+
+    def group_distance(self, qubits_one, qubits_two):
+        """Batched hop distance between qubit groups: the smallest distance between their qubits (0 if they share one).
+        Disconnected groups get -1. Takes the same arguments as is_adjacent().
+        """
+        one, two = np.asarray(qubits_one), np.asarray(qubits_two)
+        single = one.ndim == 1
+        one, two = np.atleast_2d(one), np.atleast_2d(two)
+        distance = self.distance[one[:, :, None], two[:, None, :]].astype(float)
+        distance[distance < 0] = np.inf
+        distance = distance.min(axis = (1, 2))
+        distance = np.where(np.isinf(distance), -1, distance).astype(np.int64)
+        return int(distance[0]) if single else distance
+
+
+
+    def pair_triples(self, adj_distance = 1, min_nonadj_distance = 2, max_nonadj_distance = None):
+        """Enumerate every (control, adjacent, non-adjacent) triple of coupled qubit pairs.
+
+        The adjacent pair is `adj_distance` hops from the control pair, and the non-adjacent pair is
+        at least `min_nonadj_distance` (and at most `max_nonadj_distance`) hops from it, with the
+        distance as in group_distance(); a distance of 1 means the pairs are coupled but share no qubit.
+        Return:
+            np.ndarray: (num_triples, 3, 2) qubit pairs, from self.edges.
+        """
+        edges = self.edges
+        distance = self.group_distance(np.repeat(edges, len(edges), axis = 0), np.tile(edges, (len(edges), 1))).reshape(len(edges), len(edges))
+        reachable = distance >= 0
+        adjacent = reachable & (distance == adj_distance)
+        nonadjacent = reachable & (distance >= min_nonadj_distance)
+        if max_nonadj_distance is not None:
+            nonadjacent &= distance <= max_nonadj_distance
+        control, adj, nonadj = np.nonzero(adjacent[:, :, None] & nonadjacent[:, None, :])
+        return np.stack([edges[control], edges[adj], edges[nonadj]], axis = 1)
+
+
+
+def coupling_index(backend):
+    """Return the CouplingIndex of `backend`, built on the first call for each backend object."""
+    entry = _coupling_indexes.get(id(backend))
+    if entry is None or entry[0] is not backend:
+        configuration = backend.configuration()
+        entry = _coupling_indexes[id(backend)] = (backend, CouplingIndex(configuration.coupling_map or [], configuration.n_qubits))
+    return entry[1]
+
+
+
 def check_adjacency(qubit_pair_one, qubit_pair_two, backend):
-    pairs = [[i, j] for i in qubit_pair_one for j in qubit_pair_two]
-    for pair in pairs:
-        for coupling in backend.configuration().coupling_map:
-            if pair == coupling:
-                return True
-    return False
+    """Whether the coupling map of `backend` has a coupling [i, j] with i in qubit_pair_one and j in qubit_pair_two."""
+    return coupling_index(backend).is_adjacent(qubit_pair_one, qubit_pair_two, directed = True)
 
 
 
@@ -0,0 +1,221 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from .trace_utils import span, traced
+
+# backend -> configuration hash; weak, so backends that are no longer used are dropped
+_backend_keys = weakref.WeakKeyDictionary()
+
+_default_cache = None
+
+
+def backend_key(backend):
+    """Hash of the backend name, configuration and calibration date, memoized per backend object."""
+    import qiskit
+
+    digest = _backend_keys.get(backend)
+    if digest is None:
+        properties = backend.properties() if hasattr(backend, 'properties') else None
+        last_update = getattr(properties, 'last_update_date', None)
+        digest = hashlib.sha256(json.dumps({
+            "configuration": backend.configuration().to_dict(),
+            "last_update_date": str(last_update),
+            "qiskit": qiskit.__version__,
+        }, sort_keys = True, default = str).encode()).hexdigest()
+        _backend_keys[backend] = digest
+    return digest
+
+
+
+def circuit_key(circ):
+    """Hash of the circuit structure: its QPY serialization (registers, gates, parameters, calibrations).
+    The name, which qiskit generates per instance, and the metadata are left out, so identically
+    built circuits share a key.
+    """
+    from qiskit import qpy
+
+    canonical = circ.copy()
+    canonical.name = 'circuit'
+    canonical.metadata = {}
+    buffer = io.BytesIO()
+    qpy.dump(canonical, buffer)
+    return hashlib.sha256(buffer.getvalue()).hexdigest()
+
+
+
+def _options_key(options):
+    return json.dumps(options, sort_keys = True, default = repr)
+
+
+
+class TranspileCache:
+    """Content-addressed cache of transpiled circuits and schedule durations.
+
+    Entries are keyed by the circuit structure, the backend configuration hash and the
+    transpiler options, and kept in an in-memory LRU of `max_size` entries; with `cache_dir`,
+    they are also written to disk (transpiled circuits as QPY, durations as JSON), so later
+    sessions and notebook re-runs load them instead of transpiling again.
+    Without seed_transpiler, transpilation with optimization_level >= 1 is not deterministic;
+    the cache returns the first result for every later call with the same key.
+    The returned circuits take the name and metadata of the circuits passed in. The cache
+    is safe to use from several threads.
+    """
+
+    def __init__(self, cache_dir = None, max_size = 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+
+
+    def _key(self, kind, circ, backend, options):
+        return hashlib.sha256(f"{kind}:{circuit_key(circ)}:{backend_key(backend)}:{_options_key(options)}".encode()).hexdigest()
+
+
+
+    def _get(self, key, suffix):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        filename = os.path.join(self.cache_dir, key + suffix) if self.cache_dir else None
+        if filename and os.path.isfile(filename):
+            if suffix == '.qpy':
+                from qiskit import qpy
+                with open(filename, 'rb') as f:
+                    value = qpy.load(f)[0]
+            else:
+                with open(filename, 'r') as f:
+                    value = json.load(f)
+            with self._lock:
+                self.disk_hits += 1
+            self._put(key, value)
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+
+
+    def _put(self, key, value, suffix = None):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last = False)
+
+        if suffix and self.cache_dir:
+            filename = os.path.join(self.cache_dir, key + suffix)
+            os.makedirs(self.cache_dir, exist_ok = True)
+            # write-then-rename, so concurrent sessions never read a partial file
+            tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_filename, 'wb' if suffix == '.qpy' else 'w') as f:
+                if suffix == '.qpy':
+                    from qiskit import qpy
+                    qpy.dump(value, f)
+                else:
+                    json.dump(value, f)
+            os.replace(tmp_filename, filename)
+
+
+
+    @traced('TranspileCache.transpile')
+    def transpile(self, circuits, backend, **transpiler_options):
+        """Cached qiskit.transpile(); only the circuits missing from the cache are transpiled, in one call.
+        Args:
+            circuits (QuantumCircuit or list): The circuits to transpile.
+            backend (Backend): The target backend.
+            transpiler_options: Keyword arguments of qiskit.transpile().
+        Return:
+            QuantumCircuit or list: Copies of the transpiled circuits, so callers may modify them.
+        """
+        from qiskit import transpile
+
+        single = not isinstance(circuits, (list, tuple))
+        circuits = [circuits] if single else list(circuits)
+
+        keys = [self._key('transpile', circ, backend, transpiler_options) for circ in circuits]
+        transpiled = [self._get(key, '.qpy') for key in keys]
+        missing = [i for i, circ in enumerate(transpiled) if circ is None]
+        if missing:
+            with span('transpile', num_circuits = len(missing)):
+                new_circs = transpile([circuits[i] for i in missing], backend = backend, **transpiler_options)
+            for i, circ in zip(missing, new_circs if isinstance(new_circs, list) else [new_circs]):
+                self._put(keys[i], circ, '.qpy')
+                transpiled[i] = circ
+
+        transpiled = [circ.copy() for circ in transpiled]
+        for circ, transpiled_circ in zip(circuits, transpiled):
+            transpiled_circ.name = circ.name
+            transpiled_circ.metadata = dict(circ.metadata or {})
+        return transpiled[0] if single else transpiled
+
+
+
+    def schedule_duration(self, circ, backend, **transpiler_options):
+        """Cached schedule(transpile(circ, backend), backend).duration, in dt.
+        The transpiled circuit itself is looked up in (and added to) the cache as well.
+        """
+        from qiskit import schedule
+
+        key = self._key('duration', circ, backend, transpiler_options)
+        duration = self._get(key, '.json')
+        if duration is None:
+            transpiled = self.transpile(circ, backend, **transpiler_options)
+            with span('schedule'):
+                duration = schedule(transpiled, backend).duration
+            self._put(key, duration, '.json')
+        return duration
+
+
+
+    def stats(self):
+        """Return {'hits', 'disk_hits', 'misses', 'size'}; hits counts memory hits only."""
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self._memory)}
+
+
+
+    def clear(self, disk = False):
+        """Empty the in-memory tier and reset the statistics; with disk=True, also remove the cache files."""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.disk_hits = self.misses = 0
+        if disk and self.cache_dir and os.path.isdir(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(('.qpy', '.json')):
+                    os.remove(os.path.join(self.cache_dir, filename))
+
+
+
+def get_cache(cache_dir = None):
+    """Return the module-wide TranspileCache, setting its disk directory if cache_dir is given."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TranspileCache(cache_dir)
+    elif cache_dir:
+        _default_cache.cache_dir = cache_dir
+    return _default_cache
+
+
+
+def cached_transpile(circuits, backend, **transpiler_options):
+    """TranspileCache.transpile() on the module-wide cache."""
+    return get_cache().transpile(circuits, backend, **transpiler_options)
+
+
+
+def cached_schedule_duration(circ, backend, **transpiler_options):
+    """TranspileCache.schedule_duration() on the module-wide cache."""
+    return get_cache().schedule_duration(circ, backend, **transpiler_options)
@@ -0,0 +1,169 @@
+import numpy as np
+
+from .fit_utils import levenberg_marquardt
+
+# Relative separation forced between equal decay rates, where the Bateman solution is 0 / 0.
+_RATE_SEPARATION = 1e-4
+
+
+def _separate_rates(rates):
+    """Nudge (nearly) equal rates apart so that every difference in the Bateman solution is nonzero."""
+    rates = rates.copy()
+    for i in range(2, rates.shape[-1]):
+        for j in range(1, i):
+            close = np.abs(rates[..., i] - rates[..., j]) < _RATE_SEPARATION * rates[..., j]
+            rates[..., i] = np.where(close, rates[..., j] * (1 + 2 * _RATE_SEPARATION), rates[..., i])
+    return rates
+
+
+
+def cascade_populations(t, lifetimes, start_state):
+    """Populations of |0>..|start_state> after a delay t, for the cascade |n> -> |n-1> -> ... -> |0>.
+
+    Bateman solution of the chain with decay rate 1 / lifetimes[k - 1] out of |k>; |0> does not decay.
+    Args:
+        t (np.ndarray): Delays, (..., num_delays), in the units of lifetimes.
+        lifetimes (np.ndarray): (..., num_levels) lifetimes of |1>, |2>, ..., at least start_state of them.
+        start_state (int): The initially prepared state.
+    Return:
+        np.ndarray: (..., start_state + 1, num_delays) populations of |0>..|start_state>.
+    """
+    lifetimes = np.asarray(lifetimes, dtype = float)
+    rates = np.concatenate([np.zeros(lifetimes.shape[:-1] + (1, )), 1 / lifetimes[..., :start_state]], axis = -1)
+    rates = _separate_rates(rates)
+    t = np.asarray(t, dtype = float)
+    decays = np.exp(-rates[..., :, None] * t[..., None, :])   # (..., level, delay)
+
+    populations = []
+    for n in range(start_state + 1):
+        # P_n = prod_{j = n+1..s} rate_j * sum_{i = n..s} exp(-rate_i t) / prod_{j = n..s, j != i} (rate_j - rate_i)
+        feed = np.prod(rates[..., n + 1:start_state + 1], axis = -1)[..., None]
+        total = 0
+        for i in range(n, start_state + 1):
+            denom = np.prod([rates[..., j] - rates[..., i] for j in range(n, start_state + 1) if j != i], axis = 0)
+            total = total + decays[..., i, :] / np.asarray(denom)[..., None]
+        populations.append(feed * total)
+    return np.stack(populations, axis = -2)
+
+
+
+def _cascade_model(states, num_delays):
+    """Model and finite-difference Jacobian of P(measure 1) for the start states, for levenberg_marquardt().
+
+    Parameters per curve: log lifetimes of |1>..|max(states)>, which keeps the lifetimes positive,
+    then the probability of reading 1 from |0>..|max(states)>.
+    x holds the delays of every start state back to back: (num_curves, len(states) * num_delays).
+    """
+    num_levels = max(states)
+
+    def function(x, p):
+        t = x.reshape(len(x), len(states), num_delays)
+        curves = []
+        # trial steps to vanishing or huge lifetimes give non-finite costs, which the fit rejects
+        with np.errstate(over = 'ignore', divide = 'ignore', invalid = 'ignore'):
+            lifetimes, readout = np.exp(p[:, :num_levels]), p[:, num_levels:]
+            for k, state in enumerate(states):
+                populations = cascade_populations(t[:, k], lifetimes, state)
+                curves.append(np.einsum('cl,cld->cd', readout[:, :state + 1], populations))
+        return np.concatenate(curves, axis = 1)
+
+    def jacobian(x, p):
+        base = function(x, p)
+        step = 1e-6 * np.maximum(np.abs(p), 1)
+        columns = []
+        for i in range(p.shape[1]):
+            shifted = p.copy()
+            shifted[:, i] += step[:, i]
+            columns.append((function(x, shifted) - base) / step[:, i, None])
+        return np.stack(columns, axis = -1)
+
+    return function, jacobian
+
+
+
+def _cascade_guess(t, y, states):
+    """Initial lifetimes and readout probabilities from (num_curves, len(states), num_delays) data."""
+    num_levels = max(states)
+    tail = max(1, t.shape[-1] // 10)
+    readout = np.empty((len(y), num_levels + 1))
+    readout[:, 0] = y[:, :, -tail:].mean(axis = (1, 2))
+    for level in range(1, num_levels + 1):
+        k = states.index(level) if level in states else 0
+        readout[:, level] = y[:, k, 0]
+
+    # log-linear T1 on the lowest start state, as in delay.ipynb
+    k = states.index(min(states))
+    ratio = (y[:, k] - readout[:, :1]) / np.where(readout[:, 1:2] == readout[:, :1], 1, readout[:, 1:2] - readout[:, :1])
+    valid = (ratio > 0.05) & (ratio <= 1)
+    dt = t[:, k] - t[:, k, :1]
+    denom = (dt * np.log(np.where(valid, ratio, 1))).sum(axis = 1)
+    T1 = np.where(denom < 0, -(dt**2 * valid).sum(axis = 1) / np.where(denom < 0, denom, -1), dt[:, -1] / 3)
+    # higher transmon levels decay roughly n times faster
+    lifetimes = T1[:, None] / np.arange(1, num_levels + 1)
+    return np.concatenate([np.log(lifetimes), readout], axis = 1)
+
+
+
+def fit_cascade(data, delay_list, shots, dt = 1, states = (1, 2, 3), num_bootstrap = 200, confidence = 0.95, seed = None, max_iter = 100):
+    """Fit the |3> -> |2> -> |1> -> |0> cascade to a T1 sweep of every start state and qubit at once.
+
+    P(measure 1) of start state s is sum_k r_k * P_k(t), with P_k the cascade populations and r_k
+    the probability of reading 1 from |k>, so all start states of a qubit share its lifetimes.
+    Confidence intervals come from a parametric-free binomial bootstrap: every data point is
+    resampled as Binomial(shots, p) / shots, and all replicates of all qubits are fitted in one
+    batched Levenberg-Marquardt pass, starting from the point estimate.
+    Args:
+        data (np.ndarray): (state, delay, qubit, outcome) outcome probabilities, as built in delay.ipynb,
+                           or (state, delay, qubit, 1, outcome); outcome 1 is fitted.
+        delay_list (list): Delays, in dt.
+        shots (int): Shots per circuit, for the bootstrap.
+        dt (float): Duration of dt; lifetimes are returned in the units of delay_list * dt.
+        states (tuple): The start state of every entry of the first axis of data.
+        num_bootstrap (int): Bootstrap replicates, 0 to skip the confidence intervals.
+        confidence (float): Confidence level of the intervals.
+        seed (int): Seed of the bootstrap resampling.
+        max_iter (int): Levenberg-Marquardt iterations.
+    Return:
+        dict: "lifetimes" (qubit, level) lifetimes of |1>..|max(states)>, "readout" (qubit, level + 1)
+              probabilities of reading 1 from |0>..|max(states)>, "fit" (state, delay, qubit) fitted
+              probabilities, and with num_bootstrap, "lifetimes_ci" and "readout_ci" (..., 2) intervals
+              and "lifetimes_std" and "readout_std" bootstrap standard deviations.
+    """
+    states = list(states)
+    data = np.asarray(data, dtype = float)
+    if data.ndim == 5:
+        data = data[:, :, :, 0]
+    if data.shape[0] != len(states):
+        raise ValueError(f"data has {data.shape[0]} start states, expected {len(states)}.")
+    num_delays, num_qubits = data.shape[1], data.shape[2]
+    num_levels = max(states)
+
+    # curves are qubits: y (qubit, state, delay)
+    y = np.transpose(data[..., 1], (2, 0, 1))
+    t = np.broadcast_to(np.asarray(delay_list, dtype = float) * dt, y.shape)
+    function, jacobian = _cascade_model(states, num_delays)
+
+    p0 = _cascade_guess(t, y, states)
+    params, _, _ = levenberg_marquardt(function, jacobian, t.reshape(num_qubits, -1), y.reshape(num_qubits, -1), p0, max_iter)
+    fit = function(t.reshape(num_qubits, -1), params).reshape(y.shape)
+    result = {
+        "lifetimes": np.exp(params[:, :num_levels]),
+        "readout": params[:, num_levels:],
+        "fit": np.transpose(fit, (1, 2, 0)),
+    }
+
+    if num_bootstrap:
+        rng = np.random.default_rng(seed)
+        resampled = rng.binomial(shots, np.clip(y, 0, 1), size = (num_bootstrap, ) + y.shape) / shots
+        boot_t = np.broadcast_to(t, resampled.shape).reshape(num_bootstrap * num_qubits, -1)
+        boot_p0 = np.tile(params, (num_bootstrap, 1))
+        boot_params, _, _ = levenberg_marquardt(function, jacobian, boot_t, resampled.reshape(num_bootstrap * num_qubits, -1), boot_p0, max_iter)
+        boot_params = boot_params.reshape(num_bootstrap, num_qubits, -1)
+        boot_params[..., :num_levels] = np.exp(boot_params[..., :num_levels])
+
+        alpha = (1 - confidence) / 2
+        bounds = np.moveaxis(np.quantile(boot_params, [alpha, 1 - alpha], axis = 0), 0, -1)
+        result["lifetimes_ci"], result["readout_ci"] = bounds[:, :num_levels], bounds[:, num_levels:]
+        std = boot_params.std(axis = 0)
+        result["lifetimes_std"], result["readout_std"] = std[:, :num_levels], std[:, num_levels:]
+    return result
@@ -1,10 +1,116 @@
-def run_exp(circ, num_exp, backend, shots = 500):
-    job_ids = []
-    for _ in range(num_exp):
-        job = backend.run(circ, shots = shots)
-        job_ids.append(job.job_id())
+from .trace_utils import span
+
+class SubmissionError(RuntimeError):
+    """A submission failed after the provider had accepted some of the jobs.
+
+    job_ids holds the ids of the accepted jobs, in submission order, with None for the jobs
+    that were not accepted; the original error is the __cause__.
+    """
+    def __init__(self, message, job_ids):
+        super().__init__(message)
+        self.job_ids = job_ids
+
+def _submission_error(error, job_ids):
+    """SubmissionError for `error` if any job was accepted, else `error` itself."""
+    num_accepted = sum(job_id is not None for job_id in job_ids)
+    if not num_accepted:
+        return error
+    return SubmissionError(f"{num_accepted} of {len(job_ids)} jobs were accepted before the submission failed: {error!r}", job_ids)
+
+def run_exp(circ, num_exp, backend, shots = 500, max_workers = 1, **run_options):
+    """Submit `circ` num_exp times and return the job ids in submission order.
+    Args:
+        circ (QuantumCircuit or list): The circuit(s) of each job.
+        num_exp (int): Number of jobs.
+        backend (Backend): The backend to run on.
+        shots (int): Shots per circuit.
+        max_workers (int): If larger than 1, submit concurrently through submit_jobs().
+        run_options: Other options of backend.run(), e.g. rep_delay, init_qubits.
+    Return:
+        list: The job ids.
+    Raises:
+        SubmissionError: A submission failed after others were accepted; its job_ids keeps their ids.
+    """
+    job_ids = [None] * num_exp
+    try:
+        if max_workers > 1:
+            for i, job in submit_jobs([circ] * num_exp, backend, max_workers = max_workers, shots = shots, **run_options):
+                job_ids[i] = job.job_id()
+        else:
+            for i in range(num_exp):
+                with span('backend.run'):
+                    job = backend.run(circ, shots = shots, **run_options)
+                job_ids[i] = job.job_id()
+    except Exception as e:
+        error = _submission_error(e, job_ids)
+        if error is e:
+            raise
+        raise error from e
     return job_ids
 
+def is_job_limit_error(error):
+    """Whether `error` means the provider refused a job because too many are queued."""
+    message = str(error).lower()
+    return 'JobLimit' in type(error).__name__ or 'job limit' in message or 'queue is full' in message
+
+def submit_jobs(circs, backend, max_workers = 4, max_retries = 5, backoff = 1.0, min_interval = 0, retry_on = is_job_limit_error, **run_options):
+    """Submit one job per entry of circs through a thread pool.
+
+    At most max_workers backend.run() calls are in flight, consecutive calls start at least
+    min_interval seconds apart, and calls rejected with an error matching retry_on are retried
+    after backoff * 2**attempt seconds.
+    Args:
+        circs (list): One circuit or list of circuits per job.
+        backend (Backend): The backend to run on.
+        max_workers (int): Concurrency limit.
+        max_retries (int): Retries per job before the error is raised.
+        backoff (float): Initial retry delay in seconds.
+        min_interval (float): Minimum time in seconds between two submissions.
+        retry_on (callable): Predicate on the raised exception deciding whether to retry.
+        run_options: Options of backend.run(), e.g. shots, rep_delay, init_qubits.
+    Yield:
+        tuple: (index into circs, job), as soon as each job is accepted.
+    When a submission fails, the submissions not started yet are cancelled, the ones in flight
+    are waited for and their accepted jobs yielded, and then the first error is raised.
+    """
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    lock = threading.Lock()
+    last_submission = [float('-inf')]
+
+    def submit(circ):
+        for attempt in range(max_retries + 1):
+            with lock:
+                wait = last_submission[0] + min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                last_submission[0] = time.monotonic()
+            try:
+                with span('backend.run', attempt = attempt):
+                    return backend.run(circ, **run_options)
+            except Exception as e:
+                if attempt == max_retries or not retry_on(e):
+                    raise
+                time.sleep(backoff * 2**attempt)
+
+    error = None
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = {executor.submit(submit, circ): i for i, circ in enumerate(circs)}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                if error is None:
+                    error = future.exception()
+                    for other in futures:
+                        other.cancel()
+                continue
+            yield futures[future], future.result()
+    if error is not None:
+        raise error
+
 def dump_job_ids(job_ids, qubit_layout, dirname = None, filename = None, mode = 'a'):
     from datetime import datetime
     import json
@@ -25,6 +131,15 @@ def dump_job_ids(job_ids, qubit_layout, dirname = None, filename = None, mode =
     if not filename:
         filename = "jobs_ids_" + str(datetime.now()).replace('-','_').replace(' ','_').replace(':','_')[:19] + ".json"
     
+    # '.jsonl' files are append-only journals, see journal_utils
+    if filename.endswith('.jsonl'):
+        from .journal_utils import append_job_ids
+        if mode not in ('a', 'w'):
+            raise ValueError("Please specify open() mode, either 'a' or 'w'")
+        # mode 'w' empties the journal under its lock, so concurrent writers never see it missing
+        append_job_ids(job_ids, qubit_layout, os.path.join(dirname, filename), truncate = mode == 'w')
+        print('jobs_ids were successfully saved to "' + filename + '"')
+        return
     
     if mode == 'a':
         if os.path.isfile(os.path.join(dirname, filename)):
@@ -49,4 +164,142 @@ def dump_job_ids(job_ids, qubit_layout, dirname = None, filename = None, mode =
             print('jobs_ids were successfully saved to "' + filename + '"')
     
     else:
-        raise("Please specify open() mode, either 'a' or 'w'")
\ No newline at end of file
+        raise("Please specify open() mode, either 'a' or 'w'")
+
+def _sweep_entry(entry):
+    """Split a sweep entry into (circuit or list of circuits, run options)."""
+    if isinstance(entry, tuple):
+        circs, options = entry
+    else:
+        circs, options = entry, {}
+    return circs, dict(options)
+
+def _options_key(options):
+    return tuple(sorted((name, repr(value)) for name, value in options.items()))
+
+def pack_sweep(sweep, max_experiments = None, pack_uninitialized = False, **run_options):
+    """Pack the points of a sweep into as few jobs as max_experiments allows.
+
+    Points are grouped by their run options (shots, rep_delay, init_qubits, ...), and the points
+    of a group fill jobs in sweep order. The circuits of one point always stay together and in
+    order, in one job. With init_qubits = False, every circuit starts from the state the previous
+    circuit of the job left behind, so packing would change the experiment: such points get a
+    job of their own unless pack_uninitialized is True.
+    Args:
+        sweep (dict): {coordinate: entry}, where entry is a circuit, a list of circuits run
+                      back to back, or a tuple (circuit(s), run options of this point).
+        max_experiments (int): Circuits per job limit, None for no limit.
+        pack_uninitialized (bool): Also pack the points with init_qubits = False.
+        run_options: Default run options of all points, e.g. shots, rep_delay.
+    Return:
+        tuple: jobs, a list of (run options, circuits), and index, {coordinate: (job position,
+               position of its circuit in the job, or a list of them for a list of circuits)}.
+    """
+    jobs = []
+    index = {}
+    open_jobs = {}
+    for coordinate, entry in sweep.items():
+        circs, options = _sweep_entry(entry)
+        single = not isinstance(circs, list)
+        circs = [circs] if single else circs
+        options = dict(run_options, **options)
+        if max_experiments and len(circs) > max_experiments:
+            raise ValueError(f"Sweep point {coordinate} has {len(circs)} circuits, more than max_experiments = {max_experiments}.")
+        key = _options_key(options)
+        packable = pack_uninitialized or options.get('init_qubits', True) is not False
+        position = open_jobs.get(key) if packable else None
+        if position is None or (max_experiments and len(jobs[position][1]) + len(circs) > max_experiments):
+            position = len(jobs)
+            jobs.append((options, []))
+            if packable:
+                open_jobs[key] = position
+        start = len(jobs[position][1])
+        jobs[position][1].extend(circs)
+        index[coordinate] = (position, start if single else list(range(start, start + len(circs))))
+    return jobs, index
+
+def run_sweep(sweep, backend, shots = 500, max_workers = 1, qubit_layout = None, dirname = None, filename = None, pack_uninitialized = False, job_ids = None, on_submit = None, **run_options):
+    """Submit a whole sweep in as few jobs as the backend's max_experiments allows.
+
+    The sweep is packed by pack_sweep() and every job is submitted through run_exp(), or with
+    max_workers > 1, through submit_jobs(). With filename, the job ids are saved by dump_job_ids().
+    Args:
+        sweep (dict): {coordinate: entry}, see pack_sweep(), e.g. {(state, num_reset): circ}.
+        backend (Backend): The backend to run on.
+        shots (int): Shots per circuit, unless set by a sweep point.
+        max_workers (int): If larger than 1, submit concurrently.
+        qubit_layout, dirname, filename: Passed to dump_job_ids().
+        pack_uninitialized (bool): See pack_sweep().
+        job_ids (dict): {job position: job id} of jobs accepted earlier, which are not submitted
+                        again, e.g. to resume an interrupted submission of the same sweep.
+        on_submit (callable): on_submit(job position, job id), called as each job is accepted.
+        run_options: Other options of backend.run(), unless set by a sweep point.
+    Return:
+        tuple: The job ids, in job position order, and the index of pack_sweep(), for sweep_results().
+    Raises:
+        SubmissionError: A job failed after others were accepted; their ids are in its job_ids
+                         (by job position) and, with filename, saved by dump_job_ids().
+    """
+    max_experiments = getattr(backend.configuration(), 'max_experiments', None)
+    jobs, index = pack_sweep(sweep, max_experiments, pack_uninitialized, shots = shots, **run_options)
+
+    accepted_before = job_ids or {}
+    job_ids = [None] * len(jobs)
+    for position, job_id in accepted_before.items():
+        if not 0 <= position < len(jobs):
+            raise ValueError(f"job_ids has job position {position}, but the sweep packs into {len(jobs)} jobs.")
+        job_ids[position] = job_id
+    missing = [position for position, job_id in enumerate(job_ids) if job_id is None]
+    submitted = []
+
+    def accepted(position, job_id):
+        job_ids[position] = job_id
+        submitted.append(job_id)
+        if on_submit:
+            on_submit(position, job_id)
+
+    try:
+        if max_workers > 1:
+            groups = {}
+            for position in missing:
+                groups.setdefault(_options_key(jobs[position][0]), []).append(position)
+            for positions in groups.values():
+                circs = [jobs[position][1] for position in positions]
+                for i, job in submit_jobs(circs, backend, max_workers = max_workers, **jobs[positions[0]][0]):
+                    accepted(positions[i], job.job_id())
+        else:
+            for position in missing:
+                options, circs = jobs[position]
+                accepted(position, run_exp(circs, 1, backend, **options)[0])
+    except Exception as e:
+        if filename and submitted:
+            dump_job_ids(submitted, qubit_layout, dirname, filename)
+        error = _submission_error(e, job_ids)
+        if error is e:
+            raise
+        raise error from e
+
+    if filename:
+        dump_job_ids(job_ids, qubit_layout, dirname, filename)
+    return job_ids, index
+
+def sweep_results(jobs, index, getter = None):
+    """Route the results of packed jobs back to their sweep coordinates.
+    Args:
+        jobs (list): The jobs (or their results) in job position order, e.g.
+                     [backend.retrieve_job(job_id) for job_id in job_ids].
+        index (dict): The index returned by run_sweep() or pack_sweep().
+        getter (callable): getter(result, experiment) -> value, default result.get_counts(experiment).
+    Return:
+        dict: {coordinate: value}, or a list of values for the points given as a list of circuits.
+    """
+    if getter is None:
+        getter = lambda result, experiment: result.get_counts(experiment)
+    results = [job.result() if hasattr(job, 'result') else job for job in jobs]
+    routed = {}
+    for coordinate, (position, experiments) in index.items():
+        if isinstance(experiments, list):
+            routed[coordinate] = [getter(results[position], experiment) for experiment in experiments]
+        else:
+            routed[coordinate] = getter(results[position], experiments)
+    return routed
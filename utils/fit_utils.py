@@ -0,0 +1,266 @@
+import numpy as np
+
+# Models of the calibration and decay fits, with the parameter order of the calibration notebooks:
+#     lorentzian(x, A, q_freq, B, C) = (A / pi) * (B / ((x - q_freq)**2 + B**2)) + C
+#     rabi(x, A, B, period, phi)     = A * cos(2 * pi * x / period - phi) + B
+#     exp_decay(x, A, T, C)          = A * exp(-x / T) + C
+# Every model function takes x of shape (num_curves, num_points) and parameters of shape
+# (num_curves, num_params), and its Jacobian returns (num_curves, num_points, num_params).
+
+
+def _lorentzian(x, p):
+    A, q_freq, B, C = (p[:, i, None] for i in range(4))
+    return (A / np.pi) * (B / ((x - q_freq)**2 + B**2)) + C
+
+
+
+def _lorentzian_jac(x, p):
+    A, q_freq, B, C = (p[:, i, None] for i in range(4))
+    d = x - q_freq
+    denom = d**2 + B**2
+    return np.stack([
+        B / (np.pi * denom),
+        (A / np.pi) * 2 * B * d / denom**2,
+        (A / np.pi) * (d**2 - B**2) / denom**2,
+        np.ones_like(x),
+    ], axis = -1)
+
+
+
+def _lorentzian_guess(x, y):
+    offset = np.median(y, axis = 1)
+    signal = y - offset[:, None]
+    peak = np.argmax(np.abs(signal), axis = 1)
+    height = np.take_along_axis(signal, peak[:, None], axis = 1)[:, 0]
+    spacing = np.abs(np.diff(x, axis = 1)).mean(axis = 1)
+    above = (np.abs(signal) >= np.abs(height)[:, None] / 2).sum(axis = 1)
+    width = np.maximum(above, 1) * spacing / 2
+    return np.stack([height * np.pi * width, np.take_along_axis(x, peak[:, None], axis = 1)[:, 0], width, offset], axis = -1)
+
+
+
+def _lorentzian_normalize(p):
+    # the model is unchanged by (A, B) -> (-A, -B)
+    sign = np.sign(p[:, 2])
+    p[:, 0] *= sign
+    p[:, 2] *= sign
+    return p
+
+
+
+def _rabi(x, p):
+    A, B, period, phi = (p[:, i, None] for i in range(4))
+    return A * np.cos(2 * np.pi * x / period - phi) + B
+
+
+
+def _rabi_jac(x, p):
+    A, B, period, phi = (p[:, i, None] for i in range(4))
+    angle = 2 * np.pi * x / period - phi
+    sin = np.sin(angle)
+    return np.stack([
+        np.cos(angle),
+        np.ones_like(x),
+        A * sin * 2 * np.pi * x / period**2,
+        A * sin,
+    ], axis = -1)
+
+
+
+def _rabi_guess(x, y):
+    offset = y.mean(axis = 1)
+    signal = y - offset[:, None]
+    span = x.max(axis = 1) - x.min(axis = 1)
+    num_points = x.shape[1]
+    step = x[:, 1:2] - x[:, :1]
+    if np.allclose(np.diff(x, axis = 1), step):
+        # even grid: zero-padded FFT, 8 bins per oscillation over the sweep, from half an oscillation up
+        num_fft = 8 * num_points
+        spectrum = np.fft.rfft(signal, num_fft, axis = 1)[:, 4:]
+        freqs = np.arange(4, num_fft // 2 + 1)[None, :] / (num_fft * step)
+        spectrum = spectrum * np.exp(-2j * np.pi * freqs * x[:, :1])
+    else:
+        # scan frequencies from half an oscillation over the sweep up to num_points / 2 oscillations
+        freqs = np.linspace(0.5, num_points / 2, 4 * num_points)[None, :] / span[:, None]
+        spectrum = np.einsum('cm,cmf->cf', signal, np.exp(-2j * np.pi * x[:, :, None] * freqs[:, None, :]))
+    best = np.argmax(np.abs(spectrum), axis = 1)
+    peak = np.take_along_axis(spectrum, best[:, None], axis = 1)[:, 0]
+    freq = np.take_along_axis(np.broadcast_to(freqs, spectrum.shape), best[:, None], axis = 1)[:, 0]
+    return np.stack([2 * np.abs(peak) / num_points, offset, 1 / freq, -np.angle(peak)], axis = -1)
+
+
+
+def _rabi_normalize(p):
+    # period > 0, A > 0 and phi in (-pi, pi]
+    negative = p[:, 2] < 0
+    p[negative, 2] *= -1
+    p[negative, 3] *= -1
+    negative = p[:, 0] < 0
+    p[negative, 0] *= -1
+    p[negative, 3] += np.pi
+    p[:, 3] = np.pi - np.mod(np.pi - p[:, 3], 2 * np.pi)
+    return p
+
+
+
+def _exp_decay(x, p):
+    A, T, C = (p[:, i, None] for i in range(3))
+    return A * np.exp(-x / T) + C
+
+
+
+def _exp_decay_jac(x, p):
+    A, T, C = (p[:, i, None] for i in range(3))
+    decay = np.exp(-x / T)
+    return np.stack([decay, A * decay * x / T**2, np.ones_like(x)], axis = -1)
+
+
+
+def _exp_decay_guess(x, y):
+    order = np.argsort(x, axis = 1)
+    x, y = np.take_along_axis(x, order, axis = 1), np.take_along_axis(y, order, axis = 1)
+    tail = max(1, x.shape[1] // 10)
+    offset = y[:, -tail:].mean(axis = 1)
+    amplitude = y[:, 0] - offset
+    ratio = (y - offset[:, None]) / np.where(amplitude == 0, 1, amplitude)[:, None]
+    valid = (ratio > 0.05) & (ratio <= 1)
+    dx = x - x[:, :1]
+    log_ratio = np.log(np.where(valid, ratio, 1))
+    # least squares of log(ratio) = -dx / T through the origin, on the points well above the offset
+    denom = (dx * log_ratio * valid).sum(axis = 1)
+    T = np.where(denom < 0, -(dx**2 * valid).sum(axis = 1) / np.where(denom < 0, denom, -1), (x[:, -1] - x[:, 0]) / 3)
+    return np.stack([amplitude * np.exp(x[:, 0] / T), T, offset], axis = -1)
+
+
+
+MODELS = {
+    'lorentzian': (_lorentzian, _lorentzian_jac, _lorentzian_guess, _lorentzian_normalize),
+    'rabi': (_rabi, _rabi_jac, _rabi_guess, _rabi_normalize),
+    'exp_decay': (_exp_decay, _exp_decay_jac, _exp_decay_guess, None),
+}
+
+
+
+def levenberg_marquardt(function, jacobian, x, y, p0, max_iter = 200, tol = 1e-10):
+    """Batched Levenberg-Marquardt least squares: every curve is fitted at once, in lockstep.
+
+    The damped normal equations are solved with Jacobi (column) scaling, so parameters of very
+    different magnitude (e.g. frequencies in Hz and amplitudes of order 1) stay well-conditioned.
+    Args:
+        function, jacobian: Model and Jacobian, called as function(x, p) and jacobian(x, p) on all curves.
+        x, y (np.ndarray): (num_curves, num_points).
+        p0 (np.ndarray): (num_curves, num_params) initial parameters.
+    Return:
+        tuple: Parameters (num_curves, num_params), their standard errors, and the residual sum of squares (num_curves).
+    """
+    params = np.array(p0, dtype = float)
+    residual = y - function(x, params)
+    cost = (residual**2).sum(axis = 1)
+    damping = np.full(len(params), 1e-3)
+    active = np.ones(len(params), dtype = bool)
+    num_params = params.shape[1]
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        idx = np.flatnonzero(active)
+        jac = jacobian(x[idx], params[idx])
+        jtj = np.einsum('cmi,cmj->cij', jac, jac)
+        grad = np.einsum('cmi,cm->ci', jac, residual[idx])
+        scale = np.sqrt(np.maximum(np.einsum('cii->ci', jtj), 1e-300))
+        scaled = jtj / scale[:, :, None] / scale[:, None, :] + damping[idx, None, None] * np.eye(num_params)
+        step = np.linalg.solve(scaled, (grad / scale)[:, :, None])[:, :, 0] / scale
+
+        trial = params[idx] + step
+        with np.errstate(over = 'ignore', invalid = 'ignore'):
+            trial_residual = y[idx] - function(x[idx], trial)
+            trial_cost = (trial_residual**2).sum(axis = 1)
+        better = np.isfinite(trial_cost) & (trial_cost <= cost[idx])
+
+        accepted = idx[better]
+        params[accepted] = trial[better]
+        residual[accepted] = trial_residual[better]
+        converged = (np.abs(step) <= tol * (np.abs(trial) + tol)).all(axis = 1) | (better & (cost[idx] - trial_cost <= tol * cost[idx]))
+        cost[accepted] = trial_cost[better]
+        damping[idx] = np.where(better, damping[idx] / 10, damping[idx] * 10)
+        active[idx[converged | (damping[idx] > 1e12)]] = False
+
+    jac = jacobian(x, params)
+    jtj = np.einsum('cmi,cmj->cij', jac, jac)
+    dof = max(1, x.shape[1] - num_params)
+    covariance = np.linalg.pinv(jtj) * (cost / dof)[:, None, None]
+    errors = np.sqrt(np.abs(np.einsum('cii->ci', covariance)))
+    return params, errors, cost
+
+
+
+def _fit_chunk(model, x, y, p0, max_iter):
+    function, jacobian, guess, normalize = MODELS[model]
+    if p0 is None:
+        p0 = guess(x, y)
+    params, errors, _ = levenberg_marquardt(function, jacobian, x, y, p0, max_iter)
+    if normalize:
+        params = normalize(params)
+    return params, errors, function(x, params)
+
+
+
+def fit_batch(x_values, y_values, model, init_params = None, max_workers = None, chunk_size = 256, max_iter = 200):
+    """Fit every curve of y_values to one model at once: all qubits (and states) in one call.
+    Args:
+        x_values (np.ndarray): Sweep values, (num_points, ) shared by all curves or the shape of y_values.
+        y_values (np.ndarray): Data, (..., num_points), e.g. (num_qubits, num_points) or (num_states, num_qubits, num_points).
+        model (str): One of MODELS: 'lorentzian', 'rabi' or 'exp_decay'.
+        init_params (np.ndarray): Initial parameters, (num_params, ) or (..., num_params).
+                                  Defaults to guesses computed from the data of each curve.
+        max_workers (int): Fit chunks of `chunk_size` curves in this many processes; in-process if None.
+        chunk_size (int): Curves per process pool task.
+        max_iter (int): Levenberg-Marquardt iterations.
+    Return:
+        tuple: Parameters (..., num_params) and their standard errors, in the model's parameter order,
+               and the fitted curves (..., num_points).
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model {model}, choose one of {list(MODELS)}.")
+    y_values = np.real(np.asarray(y_values, dtype = complex if np.iscomplexobj(y_values) else float))
+    batch_shape, num_points = y_values.shape[:-1], y_values.shape[-1]
+    y = y_values.reshape(-1, num_points)
+    x = np.broadcast_to(np.asarray(x_values, dtype = float), y_values.shape).reshape(-1, num_points)
+    p0 = None
+    if init_params is not None:
+        init_params = np.asarray(init_params, dtype = float)
+        p0 = np.broadcast_to(init_params, batch_shape + init_params.shape[-1:]).reshape(len(y), -1)
+
+    chunks = [slice(start, start + chunk_size) for start in range(0, len(y), chunk_size)]
+    if max_workers and len(chunks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers = max_workers) as executor:
+            futures = [executor.submit(_fit_chunk, model, x[chunk], y[chunk], None if p0 is None else p0[chunk], max_iter) for chunk in chunks]
+            results = [future.result() for future in futures]
+    else:
+        results = [_fit_chunk(model, x[chunk], y[chunk], None if p0 is None else p0[chunk], max_iter) for chunk in chunks]
+
+    params, errors, y_fit = (np.concatenate(arrays) for arrays in zip(*results))
+    num_params = params.shape[-1]
+    return params.reshape(batch_shape + (num_params, )), errors.reshape(batch_shape + (num_params, )), y_fit.reshape(y_values.shape)
+
+
+
+def fit_pi_pulses(freq_sweep, freq_data, drive_amps, rabi_data, freq_init_params = None, rabi_init_params = None, max_workers = None):
+    """Fit the frequency sweeps and Rabi sweeps of all qubits of one transition (1->2 or 2->3).
+
+    The outputs are the frequency and pi amplitude lists of Sched.parse_pi_12_23_gate_data().
+    Args:
+        freq_sweep (np.ndarray): (num_qubits, num_points) drive frequencies in Hz, or one sweep for all qubits.
+        freq_data (np.ndarray): (num_qubits, num_points) measured signal; the real part is fitted.
+        drive_amps (np.ndarray): Drive amplitudes of the Rabi sweep.
+        rabi_data (np.ndarray): (num_qubits, num_amps) measured signal.
+        freq_init_params, rabi_init_params: Optional initial parameters, as in fit_batch().
+        max_workers (int): Process pool size, as in fit_batch().
+    Return:
+        tuple: freq_list, pi_amp_list, and their standard errors, as arrays of length num_qubits.
+    """
+    freq_params, freq_errors, _ = fit_batch(freq_sweep, freq_data, 'lorentzian', freq_init_params, max_workers)
+    rabi_params, rabi_errors, _ = fit_batch(drive_amps, rabi_data, 'rabi', rabi_init_params, max_workers)
+    return freq_params[..., 1], rabi_params[..., 2] / 2, freq_errors[..., 1], rabi_errors[..., 2] / 2
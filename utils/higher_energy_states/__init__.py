@@ -1,4 +1,6 @@
 from .pulse_gate import Sched
-from .state_prep import gen_circ
+from .state_prep import gen_circ, gen_circ_sweep
+from .discriminator import IQDiscriminator, gen_cal_circs
+from .simulator import HigherEnergySimulator
 
-__all__ = ['Sched', 'gen_circ']
\ No newline at end of file
+__all__ = ['Sched', 'gen_circ', 'gen_circ_sweep', 'IQDiscriminator', 'gen_cal_circs', 'HigherEnergySimulator']
\ No newline at end of file
@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class IQDiscriminator:
+    """Per-qubit linear discriminant for the |0>..|3> states of single-shot (meas_level = 1) IQ data.
+
+    Every qubit gets one Gaussian blob per state with a covariance shared by the states (LDA),
+    so classifying a shot is a handful of multiply-adds on its I and Q values. Data is laid out
+    as returned by get_job_data(average = False): qubits on axis 0 (or qubit_axis), shots on the last axis.
+    """
+
+    def __init__(self, states = (0, 1, 2, 3)):
+        self.states = list(states)
+        self.means = None       # (num_qubits, num_states) complex
+        self.covariance = None  # (num_qubits, 2, 2) pooled covariance of (I, Q)
+        self._weights = None    # (num_qubits, num_states, 2)
+        self._bias = None       # (num_qubits, num_states)
+        self.assignment = None  # (num_qubits, num_states, num_states), see assignment_matrix()
+
+
+
+    def fit(self, cal_data):
+        """Train on calibration shots.
+        Args:
+            cal_data (np.ndarray): Complex array (num_qubits, num_states, shots), where cal_data[:, k]
+                                   are the shots of the gen_circ(state = self.states[k]) circuit,
+                                   e.g. get_job_data(job, average = False) of a job running gen_cal_circs().
+        Return:
+            IQDiscriminator: self.
+        """
+        cal_data = np.asarray(cal_data)
+        if cal_data.ndim != 3 or cal_data.shape[1] != len(self.states):
+            raise ValueError(f"cal_data must have shape (num_qubits, {len(self.states)}, shots), got {cal_data.shape}.")
+
+        self.means = cal_data.mean(axis = 2)
+        centered = cal_data - self.means[:, :, None]
+        re, im = centered.real, centered.imag
+        dof = cal_data.shape[1] * (cal_data.shape[2] - 1)
+        cov_ii, cov_iq, cov_qq = (re * re).sum(axis = (1, 2)) / dof, (re * im).sum(axis = (1, 2)) / dof, (im * im).sum(axis = (1, 2)) / dof
+        self.covariance = np.stack([np.stack([cov_ii, cov_iq], axis = -1), np.stack([cov_iq, cov_qq], axis = -1)], axis = -2)
+
+        self._set_params(self.means, self.covariance)
+        return self
+
+
+
+    def _check_fitted(self, num_qubits):
+        if self._weights is None:
+            raise ValueError("The discriminator is not fitted, call fit() first.")
+        if num_qubits != self._weights.shape[0]:
+            raise ValueError(f"The discriminator is fitted for {self._weights.shape[0]} qubits, got {num_qubits}.")
+
+
+
+    def _labels(self, chunk, qubits):
+        """State indices (into self.states) of a (rows, shots) chunk whose rows belong to `qubits`, one pass per state."""
+        re, im = chunk.real, chunk.imag
+        best = None
+        labels = np.zeros(chunk.shape, dtype = np.int8)
+        for k in range(len(self.states)):
+            score = re * self._weights[qubits, k, 0][:, None] + im * self._weights[qubits, k, 1][:, None] + self._bias[qubits, k][:, None]
+            if best is None:
+                best = score
+            else:
+                better = score > best
+                labels[better] = k
+                np.maximum(best, score, out = best)
+        return labels
+
+
+
+    def predict(self, data, qubit_axis = 0, chunk_size = 2**20):
+        """Classify every shot.
+        Args:
+            data (np.ndarray): Complex single-shot data (..., shots) with the qubits on `qubit_axis`.
+                               May be a memory-mapped array; it is read `chunk_size` values at a time.
+            qubit_axis (int): Axis of `data` holding the qubits, e.g. 1 for the output of get_job_data() on a list of jobs.
+            chunk_size (int): Number of IQ values classified at once.
+        Return:
+            np.ndarray: The states (from self.states), int8, with the shape of `data`.
+        """
+        data = np.moveaxis(data, qubit_axis, 0)
+        self._check_fitted(data.shape[0])
+        states = np.asarray(self.states, dtype = np.int8)
+        labels = np.empty(data.shape, dtype = np.int8)
+        for index in self._chunks(data.shape, chunk_size):
+            labels[index] = states[self._labels(np.asarray(data[index]), index[0])]
+        return np.moveaxis(labels, 0, qubit_axis)
+
+
+
+    def populations(self, data, qubit_axis = 0, chunk_size = 2**20, mitigate = False):
+        """Fraction of the shots found in each state, without materializing the labels of all shots.
+        Args:
+            data, qubit_axis, chunk_size: As in predict().
+            mitigate (bool): Correct the populations with the inverse of the assignment matrix
+                             measured by the last call to assignment_matrix().
+        Return:
+            np.ndarray: (num_qubits, *batch, num_states) populations, where batch are the axes of
+                        `data` other than the qubit and shot axes.
+        """
+        data = np.moveaxis(data, qubit_axis, 0)
+        self._check_fitted(data.shape[0])
+        num_states = len(self.states)
+        num_rows = int(np.prod(data.shape[:-1]))
+        offsets = (np.arange(num_rows) * num_states).reshape(data.shape[:-1] + (1, ))
+
+        counts = np.zeros(num_rows * num_states, dtype = np.int64)
+        for index in self._chunks(data.shape, chunk_size):
+            labels = self._labels(np.asarray(data[index]), index[0])
+            counts += np.bincount((offsets[index[:-1]] + labels).ravel(), minlength = counts.size)
+        populations = counts.reshape(data.shape[:-1] + (num_states, )) / data.shape[-1]
+
+        if mitigate:
+            if self.assignment is None:
+                raise ValueError("No assignment matrix, call assignment_matrix() first.")
+            # assignment[q, measured, prepared]; solve per qubit for the prepared populations
+            inverse = np.linalg.pinv(self.assignment)
+            populations = np.einsum('qij,q...j->q...i', inverse, populations)
+        return populations
+
+
+
+    def assignment_matrix(self, cal_data):
+        """Measure the (num_qubits, num_states, num_states) assignment matrix, [q, measured, prepared],
+        from calibration shots laid out as in fit(), preferably not the ones used for fitting.
+        """
+        self.assignment = np.swapaxes(self.populations(cal_data), 1, 2)
+        return self.assignment
+
+
+
+    @staticmethod
+    def _chunks(shape, chunk_size):
+        """Index tuples covering an array of `shape` in blocks of about chunk_size values: a run of rows
+        of the leading axes (as index arrays), and slices of the last (shot) axis when one row is larger.
+        """
+        num_rows = int(np.prod(shape[:-1]))
+        shots = shape[-1]
+        shot_step = max(1, min(shots, chunk_size))
+        rows_per_chunk = max(1, chunk_size // max(1, shots))
+        for start in range(0, num_rows, rows_per_chunk):
+            rows = np.unravel_index(np.arange(start, min(start + rows_per_chunk, num_rows)), shape[:-1])
+            for shot_start in range(0, shots, shot_step):
+                yield rows + (slice(shot_start, shot_start + shot_step), )
+
+
+
+    def save(self, filename):
+        """Save the fitted parameters to a .npz file."""
+        np.savez(filename, states = self.states, means = self.means, covariance = self.covariance)
+
+
+
+    @classmethod
+    def load(cls, filename):
+        """Load a discriminator written by save()."""
+        with np.load(filename) as data:
+            discriminator = cls(data["states"].tolist())
+            discriminator._set_params(data["means"], data["covariance"])
+        return discriminator
+
+
+
+    def _set_params(self, means, covariance):
+        self.means, self.covariance = means, covariance
+        inverse = np.linalg.inv(covariance)
+        means = np.stack([means.real, means.imag], axis = -1)
+        self._weights = np.einsum('qij,qkj->qki', inverse, means)
+        self._bias = -0.5 * np.einsum('qki,qki->qk', self._weights, means)
+
+
+
+def gen_cal_circs(num_qubit, qubit_list, sched, sched_list = None, states = (0, 1, 2, 3)):
+    """Calibration circuits for IQDiscriminator.fit(): one measured gen_circ() per state, in order."""
+    from .state_prep import gen_circ
+
+    return [gen_circ(state, num_qubit, qubit_list, sched, sched_list) for state in states]
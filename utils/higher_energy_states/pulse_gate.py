@@ -1,9 +1,22 @@
 from typing import Iterable
 
+from ..trace_utils import traced
+
+# Schedules shared by every Sched, keyed by _sched_key(): identical gate entries on the same
+# backend map to a single schedule object.
+_sched_cache = {}
+
 
 class Sched:
-    def __init__(self, backend):
+    def __init__(self, backend, cache_dir = None):
+        """
+        Args:
+            backend (Backend): The backend the schedules are built for.
+            cache_dir (str): Optional directory where built schedules are pickled, so later
+                             sessions and parallel workers load them instead of rebuilding.
+        """
         self.backend = backend
+        self.cache_dir = cache_dir
 
         # example:
         # gate_data = [
@@ -25,58 +38,138 @@ class Sched:
 
         self.scheds = []
 
+        # (label, qubit) -> entry of self.gate_data, filled by create_scheds()
+        self._gate_index = {}
+
+        # (label, qubit) -> entry of self.scheds, filled as schedules are built
+        self._sched_index = {}
+
         self.num_qubits = backend.configuration().num_qubits
 
-    def add_gate_data(self, data_name, data):
-        self.gate_data[data_name] = data
+    def add_gate_data(self, data):
+        """Add one gate entry, replacing the entry with the same label and qubit.
+        A schedule already built for that label and qubit is dropped and rebuilt on next use.
+        """
+        key = (data["label"], data["qubit"])
+        self.gate_data = [gate for gate in self.gate_data if (gate["label"], gate["qubit"]) != key] + [data]
+        self._gate_index[key] = data
+        if key in self._sched_index:
+            del self._sched_index[key]
+            self.scheds = [sched for sched in self.scheds if (sched["label"], sched["qubit"]) != key]
 
 
 
     def get_gate_data(self, data_name = None):
         if data_name:
-            return self.gate_data[data_name]
+            return [gate for gate in self.gate_data if gate["label"] == data_name]
         else:
             return self.gate_data
 
 
 
-    def create_scheds(self):
+    def _sched_key(self, gate):
+        import hashlib, json
+        import qiskit
+        return hashlib.sha256(json.dumps({
+            "backend": self.backend.configuration().backend_name,
+            "qiskit": qiskit.__version__,
+            "gate": gate
+        }, sort_keys = True).encode()).hexdigest()
+
+
+
+    @traced('Sched._build_sched')
+    def _build_sched(self, gate):
+        import os, pickle
         from qiskit import pulse
-        for gate in self.gate_data:
-            sched_dict = {
-                "name": gate["name"],
-                "label": gate["label"],
-                "qubit": gate["qubit"]
-            }
-            with pulse.build(backend=self.backend, default_alignment='sequential', name=gate["label"]) as sched:
-                drive_chan = pulse.drive_channel(gate["qubit"])
-                if gate["freq"]:
-                    pulse.set_frequency(gate["freq"], drive_chan)
-                if gate["pulse_shape"] == 'Gaussian':
-                    waveform = pulse.Gaussian
-                # TODO: add other waveform
-                pulse.play(waveform(**gate["parameters"]), drive_chan)
-            sched_dict["sched"] = sched
-            self.scheds.append(sched_dict)
 
+        key = self._sched_key(gate)
+        if key in _sched_cache:
+            return _sched_cache[key]
+
+        filename = os.path.join(self.cache_dir, key + ".pickle") if self.cache_dir else None
+        if filename and os.path.isfile(filename):
+            with open(filename, "rb") as f:
+                return _sched_cache.setdefault(key, pickle.load(f))
+
+        with pulse.build(backend=self.backend, default_alignment='sequential', name=gate["label"]) as sched:
+            drive_chan = pulse.drive_channel(gate["qubit"])
+            if gate["freq"]:
+                pulse.set_frequency(gate["freq"], drive_chan)
+            if gate["pulse_shape"] == 'Gaussian':
+                waveform = pulse.Gaussian
+            # TODO: add other waveform
+            pulse.play(waveform(**gate["parameters"]), drive_chan)
+        sched = _sched_cache.setdefault(key, sched)
+
+        if filename:
+            os.makedirs(self.cache_dir, exist_ok = True)
+            # write-then-rename, so concurrent workers never read a partial file
+            with open(f"{filename}.{os.getpid()}.tmp", "wb") as f:
+                pickle.dump(sched, f)
+            os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+        return sched
+
+
+
+    def _add_sched(self, gate):
+        sched_dict = {
+            "name": gate["name"],
+            "label": gate["label"],
+            "qubit": gate["qubit"],
+            "sched": self._build_sched(gate)
+        }
+        self.scheds.append(sched_dict)
+        self._sched_index[(gate["label"], gate["qubit"])] = sched_dict
+        return sched_dict
+
+
+
+    @traced('Sched.create_scheds')
+    def create_scheds(self, lazy = True):
+        """Prepare the schedules of self.gate_data.
+        With lazy=True, a schedule is only built (or loaded from the cache) the first time
+        get_sched()/get_scheds() asks for it; with lazy=False, all are built now.
+        """
+        self.scheds = []
+        self._sched_index = {}
+        self._gate_index = {(gate["label"], gate["qubit"]): gate for gate in self.gate_data}
+        if not lazy:
+            for gate in self.gate_data:
+                self._add_sched(gate)
 
 
-    def get_sched(self, label = None, qubit = None):
-        if isinstance(qubit, Iterable):
-            sched_list = []
-            for sched in self.scheds:
-                if sched['label'] == label and sched['qubit'] in qubit:
-                    sched_list.append(sched['sched'])
-            return sched_list
-        elif isinstance(qubit, int):
-            for sched in self.scheds:
-                if sched['label'] == label and sched['qubit'] == qubit:
-                    return sched['sched']
 
+    def _get_sched_dict(self, label, qubit):
+        sched_dict = self._sched_index.get((label, qubit))
+        if sched_dict is None and (label, qubit) in self._gate_index:
+            sched_dict = self._add_sched(self._gate_index[(label, qubit)])
+        return sched_dict
 
 
-    def get_scheds(self):
-        return self.scheds
+
+    def get_sched(self, label = None, qubit = None):
+        if isinstance(qubit, Iterable):
+            return self.get_scheds(label, qubit)
+        elif qubit is not None:
+            sched_dict = self._get_sched_dict(label, qubit)
+            if sched_dict:
+                return sched_dict['sched']
+
+
+
+    def get_scheds(self, label = None, qubits = None):
+        """Without a label, return all schedule entries. With a label, return the schedules of
+        that label on `qubits` (all qubits that have one if None), in the order of `qubits`.
+        """
+        if label is None:
+            for key in self._gate_index:
+                self._get_sched_dict(*key)
+            return self.scheds
+        if qubits is None:
+            qubits = [qubit for gate_label, qubit in self._gate_index if gate_label == label]
+        sched_dicts = [self._get_sched_dict(label, qubit) for qubit in qubits]
+        return [sched_dict['sched'] for sched_dict in sched_dicts if sched_dict]
 
 
 
@@ -0,0 +1,285 @@
+import copy
+import uuid
+
+import numpy as np
+from qiskit.providers import BackendV1, JobStatus, JobV1, Options
+from qiskit.result import Result
+
+# Level permutations of the instructions acting on populations, as lookup tables over |0>..|3>.
+# An ideal x swaps |0> and |1> and leaves |2>, |3> alone; X12 and X23 swap their two levels.
+_PERMUTATIONS = {
+    'x': np.array([1, 0, 2, 3], dtype = np.int8),
+    'X12': np.array([0, 2, 1, 3], dtype = np.int8),
+    'X23': np.array([0, 1, 3, 2], dtype = np.int8),
+}
+
+_PHASE_ONLY = {'id', 'rz', 'barrier'}
+
+_TIME_UNITS = {'s': 1, 'ms': 1e-3, 'us': 1e-6, 'ns': 1e-9, 'ps': 1e-12}
+
+
+class HigherEnergySimulator(BackendV1):
+    """Local backend simulating every qubit as a 4-level transmon, |0>..|3>, shot by shot.
+
+    It takes the configuration, defaults and properties of the backend it wraps (e.g. a fake
+    backend), so Sched and gen_circ() build the same circuits and calibrations as for hardware.
+    Qubits are tracked as level populations over all shots at once:
+        x                    swaps |0> and |1>
+        X12 / X23            gates whose calibration schedule is named 'X12' / 'X23' (as built by Sched),
+                             or gates named x12_gate / x23_gate: swap |1>,|2> / |2>,|3>
+        reset                measures the qubit and applies x if it reads 1, so |2> and |3> stay put
+        delay                cascading decay |3> -> |2> -> |1> -> |0>, with lifetimes T1, T1 / 2, T1 / 3
+        measure              reads 1 with probability readout[level]
+        id, rz, barrier      no effect on populations
+    Measurement level 1 returns IQ points around one center per level.
+    """
+
+    def __init__(self, backend, lifetimes = None, readout = None, iq_centers = None, iq_sigma = 2.0):
+        """
+        Args:
+            backend (Backend): The backend whose configuration, defaults and properties are used.
+            lifetimes (np.ndarray): (num_qubits, 3) lifetimes of |1>, |2>, |3> in seconds.
+                                    Defaults to T1, T1 / 2, T1 / 3 from the backend properties.
+            readout (np.ndarray): (num_qubits, 4) probability of reading 1 from |0>..|3>.
+                                  Defaults to the backend readout errors, and 0.9 / 0.8 for |2> / |3>.
+            iq_centers (np.ndarray): (num_qubits, 4) complex IQ centers of |0>..|3> for meas_level 1.
+            iq_sigma (float): Standard deviation of the IQ points around their center.
+        """
+        configuration = copy.deepcopy(backend.configuration())
+        configuration.backend_name = f"{configuration.backend_name}_higher_energy_simulator"
+        configuration.simulator = True
+        super().__init__(configuration)
+        self._backend = backend
+
+        num_qubits = configuration.n_qubits
+        properties = backend.properties() if hasattr(backend, 'properties') else None
+        if lifetimes is None:
+            t1 = np.array([properties.t1(q) if properties else 100e-6 for q in range(num_qubits)])
+            lifetimes = t1[:, None] / np.arange(1, 4)
+        if readout is None:
+            readout = np.tile([0.0, 1.0, 0.9, 0.8], (num_qubits, 1))
+            if properties:
+                for q in range(num_qubits):
+                    qubit_properties = properties.qubit_property(q)
+                    readout_error = qubit_properties.get('readout_error', (0, None))[0]
+                    readout[q, 0] = qubit_properties.get('prob_meas1_prep0', (readout_error, None))[0]
+                    readout[q, 1] = 1 - qubit_properties.get('prob_meas0_prep1', (readout_error, None))[0]
+        if iq_centers is None:
+            angles = np.pi / 2 + np.arange(4) * 0.6 * np.pi
+            iq_centers = np.tile(10 * np.exp(1j * angles), (num_qubits, 1))
+        self.lifetimes = np.asarray(lifetimes, dtype = float)
+        self.readout = np.asarray(readout, dtype = float)
+        self.iq_centers = np.asarray(iq_centers, dtype = complex)
+        self.iq_sigma = iq_sigma
+        self._jobs = {}
+
+
+
+    @classmethod
+    def _default_options(cls):
+        return Options(shots = 1024, memory = False, meas_level = 2, meas_return = 'avg', rep_delay = None,
+                       init_qubits = True, seed_simulator = None)
+
+
+
+    def properties(self):
+        return self._backend.properties()
+
+
+
+    def defaults(self):
+        return self._backend.defaults()
+
+
+
+    def run(self, run_input, **options):
+        """Simulate a circuit or a list of circuits; the job is done when this returns."""
+        circuits = run_input if isinstance(run_input, list) else [run_input]
+        run_options = copy.copy(self.options.__dict__)
+        run_options.update(options)
+        job = HigherEnergySimulatorJob(self, str(uuid.uuid4()), circuits, run_options)
+        job.submit()
+        self._jobs[job.job_id()] = job
+        return job
+
+
+
+    def retrieve_job(self, job_id):
+        """Return a job run by this simulator, so saved job ids work as with IBMQ backends."""
+        if job_id not in self._jobs:
+            raise ValueError(f"No job {job_id} on {self.name()}.")
+        return self._jobs[job_id]
+
+
+
+    def _compile(self, circ):
+        """Translate a circuit into (operation, qubit, clbit or duration) steps."""
+        qubit_index = {qubit: i for i, qubit in enumerate(circ.qubits)}
+        clbit_index = {clbit: i for i, clbit in enumerate(circ.clbits)}
+        dt = self.configuration().dt
+
+        steps = []
+        for instruction in circ.data:
+            operation = instruction.operation
+            name = operation.name
+            qubits = [qubit_index[qubit] for qubit in instruction.qubits]
+            if name in _PHASE_ONLY:
+                continue
+            if name == 'measure':
+                steps.append(('measure', qubits[0], clbit_index[instruction.clbits[0]]))
+            elif name == 'reset':
+                steps.append(('reset', qubits[0], None))
+            elif name == 'delay':
+                unit = operation.unit
+                duration = float(operation.duration) * (dt if unit == 'dt' else _TIME_UNITS[unit])
+                steps.extend(('delay', qubit, duration) for qubit in qubits)
+            elif name == 'x':
+                steps.append(('x', qubits[0], None))
+            else:
+                label = self._calibration_label(circ, operation, qubits)
+                if label not in _PERMUTATIONS:
+                    raise ValueError(f"HigherEnergySimulator does not support instruction {name} on qubits {qubits}.")
+                steps.append((label, qubits[0], None))
+        return steps
+
+
+
+    @staticmethod
+    def _calibration_label(circ, operation, qubits):
+        calibrations = circ.calibrations.get(operation.name, {})
+        schedule = calibrations.get((tuple(qubits), tuple(operation.params)))
+        if schedule is not None and schedule.name in _PERMUTATIONS:
+            return schedule.name
+        return {'x12_gate': 'X12', 'x23_gate': 'X23'}.get(operation.name)
+
+
+
+    def _decay(self, levels, qubit, duration, rng):
+        """Cascade the levels of one qubit through `duration` seconds, by sampled waiting times."""
+        remaining = np.full(levels.shape, duration)
+        for _ in range(3):
+            excited = levels > 0
+            if not excited.any():
+                break
+            waits = rng.exponential(self.lifetimes[qubit, np.maximum(levels, 1) - 1])
+            decays = excited & (waits < remaining)
+            levels[decays] -= 1
+            remaining = np.where(decays, remaining - waits, 0)
+
+
+
+    def _read(self, levels, qubit, rng):
+        return rng.random(levels.shape) < self.readout[qubit, levels]
+
+
+
+    def _simulate(self, steps, num_qubits, num_clbits, shots, rng, initial = None):
+        """Run the compiled steps on all shots; return (final levels, measured levels per clbit)."""
+        levels = np.zeros((num_qubits, shots), dtype = np.int8) if initial is None else initial.copy()
+        measured = np.zeros((num_clbits, shots), dtype = np.int8)
+        measured_qubits = np.zeros(num_clbits, dtype = np.int64)
+        for operation, qubit, arg in steps:
+            if operation == 'measure':
+                measured[arg] = levels[qubit]
+                measured_qubits[arg] = qubit
+            elif operation == 'reset':
+                reads_one = self._read(levels[qubit], qubit, rng)
+                levels[qubit] = np.where(reads_one, _PERMUTATIONS['x'][levels[qubit]], levels[qubit])
+            elif operation == 'delay':
+                self._decay(levels[qubit], qubit, arg, rng)
+            else:
+                levels[qubit] = _PERMUTATIONS[operation][levels[qubit]]
+        return levels, measured, measured_qubits
+
+
+
+    def _experiment_result(self, circ, options, rng):
+        steps = self._compile(circ)
+        shots = options["shots"]
+        num_qubits, num_clbits = circ.num_qubits, circ.num_clbits
+
+        initial = None
+        if not options["init_qubits"]:
+            # warm-up pass: every shot starts from the final state of the previous shot,
+            # decayed over the repetition delay
+            levels, _, _ = self._simulate(steps, num_qubits, num_clbits, shots, rng)
+            rep_delay = options["rep_delay"] or getattr(self.configuration(), 'default_rep_delay', 250e-6)
+            for qubit in range(num_qubits):
+                self._decay(levels[qubit], qubit, rep_delay, rng)
+            initial = np.roll(levels, 1, axis = 1)
+        _, measured, measured_qubits = self._simulate(steps, num_qubits, num_clbits, shots, rng, initial)
+
+        data = {}
+        if options["meas_level"] == 2:
+            bits = rng.random(measured.shape) < self.readout[measured_qubits[:, None], measured]
+            values = (bits.astype(np.int64) << np.arange(num_clbits)[:, None]).sum(axis = 0) if num_clbits else np.zeros(shots, dtype = np.int64)
+            outcomes, counts = np.unique(values, return_counts = True)
+            data["counts"] = {hex(int(outcome)): int(count) for outcome, count in zip(outcomes, counts)}
+            if options["memory"]:
+                data["memory"] = [hex(int(value)) for value in values]
+        else:
+            centers = self.iq_centers[measured_qubits[:, None], measured]
+            noise = rng.normal(scale = self.iq_sigma, size = centers.shape + (2, ))
+            iq = np.stack([centers.real, centers.imag], axis = -1) + noise   # (clbit, shot, 2)
+            if options["meas_return"] == 'avg':
+                data["memory"] = iq.mean(axis = 1).tolist()
+            else:
+                data["memory"] = np.transpose(iq, (1, 0, 2)).tolist()
+
+        header = {
+            "name": circ.name,
+            "memory_slots": num_clbits,
+            "n_qubits": num_qubits,
+            "qubit_labels": [["q", i] for i in range(num_qubits)],
+            "qreg_sizes": [[register.name, register.size] for register in circ.qregs],
+            "clbit_labels": [[register.name, i] for register in circ.cregs for i in range(register.size)],
+            "creg_sizes": [[register.name, register.size] for register in circ.cregs],
+            "metadata": circ.metadata,
+        }
+        return {
+            "shots": shots,
+            "success": True,
+            "data": data,
+            "meas_level": options["meas_level"],
+            "meas_return": options["meas_return"],
+            "header": header,
+        }
+
+
+
+class HigherEnergySimulatorJob(JobV1):
+    def __init__(self, backend, job_id, circuits, options):
+        super().__init__(backend, job_id)
+        self._circuits = circuits
+        self._options = options
+        self._result = None
+
+
+
+    def submit(self):
+        rng = np.random.default_rng(self._options["seed_simulator"])
+        backend = self.backend()
+        self._result = Result.from_dict({
+            "backend_name": backend.name(),
+            "backend_version": backend.configuration().backend_version,
+            "qobj_id": self.job_id(),
+            "job_id": self.job_id(),
+            "success": True,
+            "results": [backend._experiment_result(circ, self._options, rng) for circ in self._circuits],
+        })
+
+
+
+    def result(self, timeout = None):
+        return self._result
+
+
+
+    def status(self):
+        return JobStatus.DONE if self._result is not None else JobStatus.INITIALIZING
+
+
+
+    def backend_options(self):
+        """Run options of the job, plus n_qubits, as IBMQ jobs report them."""
+        return dict(self._options, n_qubits = self.backend().configuration().n_qubits)
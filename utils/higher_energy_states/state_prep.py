@@ -1,5 +1,8 @@
 from qiskit.circuit import QuantumCircuit, Gate
 
+from ..trace_utils import traced
+
+@traced('gen_circ')
 def gen_circ(state, num_qubit, qubit_list, sched = None, sched_list = None, num_reset = 0, reset_list = None, add_secure_reset = False, measure = True):
     circ = QuantumCircuit(num_qubit)
 
@@ -77,4 +80,108 @@ def gen_circ(state, num_qubit, qubit_list, sched = None, sched_list = None, num_
     if measure:
         circ.measure_all()
     
-    return circ
\ No newline at end of file
+    return circ
+
+
+
+def _state_prep_template(state, qreg, qubit_list, sched, sched_list):
+    """State preparation part of gen_circ() on register qreg, with every calibration attached once."""
+    circ = QuantumCircuit(qreg)
+    if state > 1:
+        if not sched:
+            raise ValueError("Please specify Sched class!")
+        if not sched_list:
+            sched_list = list(range(len(qubit_list)))
+    if state >= 1:
+        circ.x(qubit_list)
+    if state >= 2:
+        x12_gate = Gate("x12_gate", 1, [])
+        x23_gate = Gate("x23_gate", 1, [])
+        for i, qubit in enumerate(qubit_list):
+            circ.append(x12_gate, [qubit])
+            circ.add_calibration(x12_gate, (qubit, ), sched.get_sched(label = 'X12', qubit = sched_list[i]))
+            if state == 3:
+                circ.append(x23_gate, [qubit])
+                circ.add_calibration(x23_gate, (qubit, ), sched.get_sched(label = 'X23', qubit = sched_list[i]))
+    return circ
+
+
+
+def _reset_template(qreg, qubit_list, sched, reset_list, add_secure_reset):
+    """One reset round of gen_circ() on register qreg: a plain reset, or one cascading secure reset (CSR) round."""
+    circ = QuantumCircuit(qreg)
+    reset_qubits = reset_list if reset_list else qubit_list
+    if not add_secure_reset:
+        circ.reset(reset_qubits)
+        return circ
+
+    if not sched:
+        raise ValueError("Please specify Sched class!")
+    x12_gate = Gate("x12_gate", 1, [])
+    x23_gate = Gate("x23_gate", 1, [])
+    for qubit in reset_qubits:
+        circ.reset(qubit)
+        circ.append(x12_gate, [qubit])
+        circ.reset(qubit)
+        circ.append(x23_gate, [qubit])
+        circ.append(x12_gate, [qubit])
+        circ.reset(qubit)
+        circ.add_calibration(x12_gate, (qubit, ), sched.get_sched(label = 'X12', qubit = qubit))
+        circ.add_calibration(x23_gate, (qubit, ), sched.get_sched(label = 'X23', qubit = qubit))
+    return circ
+
+
+
+@traced('gen_circ_sweep')
+def gen_circ_sweep(states, num_qubit, qubit_list, sched = None, sched_list = None, num_reset_list = (0, ), reset_list = None, add_secure_reset = False, delay_list = None, measure = True):
+    """Build the whole grid of gen_circ() circuits of a sweep from templates.
+
+    One state preparation template per state and one reset round template per protocol are
+    built once, with their calibrations. Every circuit of the grid shares one quantum register,
+    so it is assembled by appending the template instructions as they are, and gets the merged
+    calibrations of its templates without add_calibration() calls or circuit copies.
+    The circuit layout is: state preparation, delay (if delay_list), reset rounds, measurement.
+    Args:
+        states (list): States to prepare, as in gen_circ().
+        num_qubit, qubit_list, sched, sched_list, reset_list, add_secure_reset, measure: As in gen_circ().
+        num_reset_list (list): Numbers of reset rounds.
+        delay_list (list): Delays in dt inserted after the state preparation. No delay if None.
+    Return:
+        list: circs[state_idx][reset_idx][delay_idx], without the delay axis if delay_list is None.
+    """
+    from qiskit.circuit import CircuitInstruction, Delay, QuantumRegister
+
+    qreg = QuantumRegister(num_qubit, 'q')
+    delay_qubits = [qreg[qubit] for qubit in qubit_list]
+    reset_round = _reset_template(qreg, qubit_list, sched, reset_list, add_secure_reset) if max(num_reset_list, default = 0) > 0 else QuantumCircuit(qreg)
+    delays = [None] if delay_list is None else [[CircuitInstruction(Delay(d), (qubit, )) for qubit in delay_qubits] for d in delay_list]
+
+    circs = []
+    for state in states:
+        prep = _state_prep_template(state, qreg, qubit_list, sched, sched_list)
+        prep_calibrations = prep.calibrations
+        reset_calibrations = {name: dict(cals) for name, cals in prep.calibrations.items()}
+        for name, cals in reset_round.calibrations.items():
+            reset_calibrations.setdefault(name, {}).update(cals)
+
+        circs_state = []
+        for num_reset in num_reset_list:
+            circs_reset = []
+            for delay in delays:
+                circ = QuantumCircuit(qreg)
+                # _append is safe here: the instructions come from circuits on the same register
+                for instruction in prep.data:
+                    circ._append(instruction)
+                for instruction in delay or []:
+                    circ._append(instruction)
+                for _ in range(num_reset):
+                    for instruction in reset_round.data:
+                        circ._append(instruction)
+                calibrations = reset_calibrations if num_reset else prep_calibrations
+                circ.calibrations = {name: dict(cals) for name, cals in calibrations.items()}
+                if measure:
+                    circ.measure_all()
+                circs_reset.append(circ)
+            circs_state.append(circs_reset[0] if delay_list is None else circs_reset)
+        circs.append(circs_state)
+    return circs
@@ -0,0 +1,141 @@
+import base64
+import io
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+# Layout of the binary interim logs written by Publisher in vqe_custom.py: the magic and the
+# number of parameters (int64), then one fixed-width row per step.
+_MAGIC = b"VQELOG01"
+_HEADER_SIZE = len(_MAGIC) + 8
+
+
+def interim_dtype(num_params):
+    """Row dtype of an interim log of `num_params` parameters."""
+    return np.dtype([("step", "<i8"), ("energy", "<f8"), ("params", "<f8", (num_params, ))])
+
+
+
+def read_interim_log(filename):
+    """Read a binary interim log in one pass.
+    Args:
+        filename (str): Log written by Publisher(messenger, log_file) or convert_interim_json().
+    Return:
+        np.ndarray: Structured array of rows with fields "step", "energy" and "params".
+                    A row torn by an interrupted write is left out.
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE or header[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{filename} is not an interim log.")
+        dtype = interim_dtype(int(np.frombuffer(header, dtype = "<i8", offset = len(_MAGIC))[0]))
+        count = (os.fstat(f.fileno()).st_size - _HEADER_SIZE) // dtype.itemsize
+        return np.fromfile(f, dtype = dtype, count = count)
+
+
+
+def write_interim_log(filename, steps, energies, params):
+    """Write (steps, energies, params) rows as a new binary interim log, atomically."""
+    params = np.asarray(params, dtype = float)
+    rows = np.empty(len(params), dtype = interim_dtype(params.shape[1]))
+    rows["step"], rows["energy"], rows["params"] = steps, energies, params
+    with open(f"{filename}.{os.getpid()}.tmp", 'wb') as f:
+        f.write(_MAGIC + np.int64(params.shape[1]).astype("<i8").tobytes())
+        rows.tofile(f)
+    os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+
+
+
+def _decode_ndarray(value):
+    """Decode the {"__type__": "ndarray", "__value__": ...} blob of the runtime JSON encoder."""
+    if not isinstance(value, dict):
+        return np.asarray(value, dtype = float)
+    if value.get("__type__") != "ndarray":
+        raise ValueError(f"Unsupported interim result value of type {value.get('__type__')}.")
+    return np.load(io.BytesIO(zlib.decompress(base64.standard_b64decode(value["__value__"]))), allow_pickle = False)
+
+
+
+def read_interim_json(filename):
+    """Read an interim_results_<i>_<j>.json file, as saved from job.interim_results().
+    Return:
+        tuple: steps (num_steps, ), energies (num_steps, ) and params (num_steps, num_params), by step.
+    """
+    with open(filename, 'r') as f:
+        interim_results = [json.loads(interim_str) for interim_str in json.load(f)]
+    interim_results.sort(key = lambda interim_result: interim_result[0])
+    steps = np.array([interim_result[0] for interim_result in interim_results], dtype = np.int64)
+    energies = np.array([np.nan if interim_result[-1] is None else interim_result[-1] for interim_result in interim_results], dtype = float)
+    params = np.array([_decode_ndarray(interim_result[1]) for interim_result in interim_results], dtype = float)
+    return steps, energies, params
+
+
+
+def convert_interim_json(json_filename, filename = None):
+    """Convert an interim_results JSON file to a binary interim log; return the log filename.
+    Args:
+        json_filename (str): The JSON file.
+        filename (str): The log to write, by default json_filename with the extension .bin.
+    """
+    filename = filename or os.path.splitext(json_filename)[0] + '.bin'
+    write_interim_log(filename, *read_interim_json(json_filename))
+    return filename
+
+
+
+def load_interim_grid(dirname, prefix = 'interim_results', convert = False):
+    """Load the interim results of a grid of runs, <prefix>_<i>_<j>.bin (or .json), into arrays.
+
+    Binary logs are read directly; JSON files without a log next to them are decoded, and
+    with convert=True, converted to a log so that the next load is fast. Runs are padded
+    to the longest one, and missing runs are left empty.
+    Args:
+        dirname (str): Directory of the result files, e.g. 'result'.
+        prefix (str): File name prefix.
+        convert (bool): Write a .bin log next to every JSON file that lacks one.
+    Return:
+        dict: "energy" (i, j, step) with NaN padding, "params" (i, j, step, num_params) with NaN padding,
+              "step" (i, j, step) with -1 padding, and "length" (i, j) number of steps of every run.
+    """
+    pattern = re.compile(rf"{re.escape(prefix)}_(\d+)_(\d+)\.(bin|json)$")
+    files = {}
+    for name in os.listdir(dirname):
+        match = pattern.match(name)
+        if match:
+            index = (int(match.group(1)), int(match.group(2)))
+            if match.group(3) == 'bin' or index not in files:
+                files[index] = os.path.join(dirname, name)
+    if not files:
+        raise ValueError(f"No {prefix}_<i>_<j> files in {dirname}.")
+
+    runs = {}
+    for index, filename in files.items():
+        if filename.endswith('.json'):
+            if convert:
+                filename = convert_interim_json(filename)
+            else:
+                runs[index] = read_interim_json(filename)
+                continue
+        rows = read_interim_log(filename)
+        runs[index] = rows["step"], rows["energy"], rows["params"]
+
+    shape = tuple(max(index[k] for index in runs) + 1 for k in range(2))
+    num_steps = max(len(run[0]) for run in runs.values())
+    num_params = max((run[2].shape[1] for run in runs.values() if len(run[0])), default = 0)
+    grid = {
+        "energy": np.full(shape + (num_steps, ), np.nan),
+        "params": np.full(shape + (num_steps, num_params), np.nan),
+        "step": np.full(shape + (num_steps, ), -1, dtype = np.int64),
+        "length": np.zeros(shape, dtype = np.int64),
+    }
+    for index, (steps, energies, params) in runs.items():
+        if not len(steps):
+            continue
+        grid["step"][index][:len(steps)] = steps
+        grid["energy"][index][:len(steps)] = energies
+        grid["params"][index][:len(steps), :params.shape[1]] = params
+        grid["length"][index] = len(steps)
+    return grid
@@ -1,22 +1,38 @@
 import pickle
 
-def get_job_data(job, average, scale_factor = 1):
+from .trace_utils import span, traced
+
+@traced('get_job_data')
+def get_job_data(job, average, scale_factor = 1, stream = False, qubits = None, dtype = None, out = None, filename = None):
     """Retrieve data from a job that has already run.
     Args:
         job (Job): The job whose data you want.
         average (bool): If True, gets the data assuming data is an average.
                         If False, gets the data assuming it is for single shots.
         scale_factor (float): Scaling factor for result data.
+        stream (bool): If True, write every experiment's memory straight into one preallocated
+                       array instead of building per-job arrays and stacking them.
+                       Implied by qubits, dtype, out or filename.
+        qubits (list): Streaming only. Memory slots (qubits) to keep. Defaults to all.
+        dtype (dtype): Streaming only. Output dtype, e.g. np.complex64 to halve single-shot memory.
+        out (np.ndarray): Streaming only. Preallocated output array of the returned shape.
+        filename (str): Streaming only. Write the output to a memory-mapped .npy file instead of RAM.
     Return:
-        list: List containing job result data. 
+        list: List containing job result data. When streaming, an array of shape
+              (num_qubits, num_experiments[, shots]) for a single job, or
+              (num_jobs, num_qubits, num_experiments[, shots]) for a list of jobs.
     """
     import numpy as np
 
+    if stream or qubits is not None or dtype is not None or out is not None or filename:
+        return _stream_job_data(job, average, scale_factor, qubits, dtype, out, filename)
+
     if isinstance(job, list):
         result_data = [get_job_data(j, average, scale_factor=scale_factor) for j in job]
     else:
         num_qubits = job.backend_options()['n_qubits']
-        job_results = job.result(timeout = 120) # timeout parameter set to 120 s
+        with span('job.result'):
+            job_results = job.result(timeout = 120) # timeout parameter set to 120 s
         if average:
             result_data = np.zeros((num_qubits, len(job_results.results)))
         else:
@@ -25,12 +41,69 @@ def get_job_data(job, average, scale_factor = 1):
         for i in range(len(job_results.results)):
             if average: # get avg data
                 result_data[:, i] = np.real(job_results.get_memory(i) * scale_factor)
-            else: # get single data
-                result_data[:, i, :] = (job_results.get_memory(i) * scale_factor).reshape((-1, shape[0]))
+            else: # get single data, memory is (shots, memory_slots)
+                result_data[:, i, :] = (job_results.get_memory(i) * scale_factor).T
     return result_data
 
 
 
+def _stream_job_data(job, average, scale_factor = 1, qubits = None, dtype = None, out = None, filename = None):
+    """Streaming path of get_job_data(): one output buffer, filled experiment by experiment.
+
+    Only the result of the job being copied and one experiment's memory are alive next to the
+    output, so peak memory stays close to the size of the final array.
+    """
+    import numpy as np
+
+    jobs = job if isinstance(job, list) else [job]
+    with span('job.result'):
+        first_results = jobs[0].result(timeout = 120)
+    memory = first_results.get_memory(0)
+    num_slots = memory.shape[-1] if average else memory.shape[1]
+    slots = list(range(num_slots)) if qubits is None else list(qubits)
+    if dtype is None:
+        dtype = float if average else complex
+    num_experiments = len(first_results.results)
+
+    shape = (len(jobs), len(slots), num_experiments)
+    if not average:
+        shape = shape + (memory.shape[0], )
+    if not isinstance(job, list):
+        shape = shape[1:]
+    if out is None:
+        if filename:
+            out = np.lib.format.open_memmap(filename, mode = 'w+', dtype = dtype, shape = shape)
+        else:
+            out = np.empty(shape, dtype = dtype)
+    elif out.shape != shape:
+        raise ValueError(f"out has shape {out.shape}, expected {shape}.")
+    buffer = out if isinstance(job, list) else out[np.newaxis]
+    del memory
+
+    for job_idx, j in enumerate(jobs):
+        if job_idx == 0:
+            job_results = first_results
+        else:
+            with span('job.result'):
+                job_results = j.result(timeout = 120)
+        if len(job_results.results) != num_experiments:
+            raise ValueError(f"Job {j.job_id()} has {len(job_results.results)} experiments, expected {num_experiments}.")
+        for i in range(num_experiments):
+            memory = job_results.get_memory(i)
+            if average:
+                buffer[job_idx, :, i] = np.real(memory[slots])
+            else:
+                buffer[job_idx, :, i, :] = memory[:, slots].T
+            if scale_factor != 1:
+                buffer[job_idx, :, i] *= scale_factor
+        job_results = first_results = None
+
+    if filename:
+        out.flush()
+    return out
+
+
+
 def save_job(job, filename):
     """Save a job or a list of job to a pickle file.
     Args:
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import struct
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    import msvcrt
+    fcntl = None
+
+# Index record: byte offset of the journal line, unix time, qubit_layout hash, number of job ids.
+_INDEX_RECORD = struct.Struct('<qdqq')
+
+
+def _layout_key(qubit_layout):
+    digest = hashlib.blake2b(json.dumps(qubit_layout, sort_keys = True).encode(), digest_size = 8).digest()
+    return struct.unpack('<q', digest)[0]
+
+
+
+def _timestamp(time_value):
+    if isinstance(time_value, datetime):
+        return time_value.timestamp()
+    if isinstance(time_value, str):
+        return datetime.fromisoformat(time_value).timestamp()
+    return time_value
+
+
+
+@contextmanager
+def _locked(f, exclusive):
+    """Hold an advisory lock on the open file `f` (fcntl on POSIX, msvcrt on Windows)."""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+
+def _index_filename(filename):
+    return filename + '.idx'
+
+
+
+def _scan(f, offset):
+    """Index entries of the complete journal lines from `offset` to the end of the journal."""
+    end = os.fstat(f.fileno()).st_size
+    entries = []
+    f.seek(offset)
+    while offset < end:
+        line = f.readline()
+        if not line.endswith(b'\n'):
+            break
+        record = json.loads(line)
+        entries.append((offset, record["timestamp"], _layout_key(record["qubit_layout"]), record["num_jobs"]))
+        offset += len(line)
+    return entries
+
+
+
+def _unindexed(filename, f, repair = False):
+    """Return (number of index records, entries of the journal lines missing from the index).
+
+    Only the last index record is read and checked against the journal: it must point at a
+    complete line. The lines after it (e.g. after a crash between the two writes of an append,
+    or a journal written by import_json_job_ids) are parsed, so an up-to-date index costs O(1).
+    An index that does not match the journal is ignored, and the whole journal is parsed.
+    With repair=True, which needs the exclusive lock, a torn or mismatched index is truncated
+    and the missing entries are written to it.
+    """
+    index_filename = _index_filename(filename)
+    size = os.path.getsize(index_filename) if os.path.isfile(index_filename) else 0
+    num_records = size // _INDEX_RECORD.size
+
+    offset = 0
+    if num_records:
+        with open(index_filename, 'rb') as idx:
+            idx.seek((num_records - 1) * _INDEX_RECORD.size)
+            last_offset = _INDEX_RECORD.unpack(idx.read(_INDEX_RECORD.size))[0]
+        line = b''
+        if last_offset < os.fstat(f.fileno()).st_size:
+            f.seek(last_offset)
+            line = f.readline()
+        if line.endswith(b'\n'):
+            offset = last_offset + len(line)
+        else:
+            num_records = 0
+    missing = _scan(f, offset)
+
+    if repair:
+        if size != num_records * _INDEX_RECORD.size:
+            os.truncate(index_filename, num_records * _INDEX_RECORD.size)
+        if missing:
+            with open(index_filename, 'ab') as idx:
+                idx.write(b''.join(_INDEX_RECORD.pack(*entry) for entry in missing))
+    return num_records, missing
+
+
+
+def _read_index(filename, f):
+    """Return the whole index of the journal open as `f`, including the entries missing from the index file."""
+    num_records, missing = _unindexed(filename, f)
+    index = []
+    if num_records:
+        with open(_index_filename(filename), 'rb') as idx:
+            index = list(_INDEX_RECORD.iter_unpack(idx.read(num_records * _INDEX_RECORD.size)))
+    return index + missing
+
+
+
+def _index_newest_first(filename, f, block_size = 1024):
+    """Yield the index entries newest first, reading the index file backwards in blocks of whole records."""
+    num_records, missing = _unindexed(filename, f)
+    yield from reversed(missing)
+    if not num_records:
+        return
+    with open(_index_filename(filename), 'rb') as idx:
+        stop = num_records
+        while stop > 0:
+            start = max(0, stop - block_size)
+            idx.seek(start * _INDEX_RECORD.size)
+            yield from reversed(list(_INDEX_RECORD.iter_unpack(idx.read((stop - start) * _INDEX_RECORD.size))))
+            stop = start
+
+
+
+def append_job_ids(job_ids, qubit_layout, filename, truncate = False):
+    """Append one record of job ids to the journal `filename`.
+
+    The journal is a JSON-lines file with a fixed-width binary index next to it
+    (filename + '.idx'); both are only ever appended to, under an exclusive file lock,
+    so appends cost O(1) and concurrent processes do not lose records.
+    With truncate=True, the journal and its index are emptied first, under the same lock.
+    """
+    now = datetime.now()
+    record = {
+        "time": str(now),
+        "timestamp": now.timestamp(),
+        "qubit_layout": qubit_layout,
+        "num_jobs": len(job_ids),
+        "job_ids": list(job_ids),
+    }
+    line = (json.dumps(record) + '\n').encode()
+    with open(filename, 'ab+') as f:
+        with _locked(f, exclusive = True):
+            if truncate:
+                f.truncate(0)
+                if os.path.isfile(_index_filename(filename)):
+                    os.truncate(_index_filename(filename), 0)
+            _unindexed(filename, f, repair = True)
+            offset = f.seek(0, os.SEEK_END)
+            f.write(line)
+            f.flush()
+            with open(_index_filename(filename), 'ab') as idx:
+                idx.write(_INDEX_RECORD.pack(offset, record["timestamp"], _layout_key(qubit_layout), len(job_ids)))
+    return record
+
+
+
+def _read_records(f, entries):
+    records = []
+    for offset, *_ in entries:
+        f.seek(offset)
+        records.append(json.loads(f.readline()))
+    return records
+
+
+
+def query_job_ids(filename, qubit_layout = None, since = None, until = None):
+    """Return the journal records matching qubit_layout and the time window [since, until].
+
+    The filter runs on the index; only matching records are read from the journal.
+    `since` and `until` may be datetimes, ISO strings or unix timestamps.
+    """
+    since, until = _timestamp(since), _timestamp(until)
+    key = None if qubit_layout is None else _layout_key(qubit_layout)
+    with open(filename, 'rb') as f:
+        with _locked(f, exclusive = False):
+            entries = [
+                entry for entry in _read_index(filename, f)
+                if (key is None or entry[2] == key)
+                and (since is None or entry[1] >= since)
+                and (until is None or entry[1] <= until)
+            ]
+            return _read_records(f, entries)
+
+
+
+def tail_job_ids(filename, num = None, qubit_layout = None):
+    """Return the last `num` job ids of the journal (all if num is None or 0, as load_job_ids()
+    does for JSON files), oldest first.
+
+    The index is read backwards from its end, so only the index blocks and records holding
+    those ids are read.
+    """
+    if not num:
+        num = None
+    key = None if qubit_layout is None else _layout_key(qubit_layout)
+    with open(filename, 'rb') as f:
+        with _locked(f, exclusive = False):
+            entries = []
+            total = 0
+            for entry in _index_newest_first(filename, f):
+                if key is not None and entry[2] != key:
+                    continue
+                entries.append(entry)
+                total += entry[3]
+                if num is not None and total >= num:
+                    break
+            job_ids = [job_id for record in _read_records(f, reversed(entries)) for job_id in record["job_ids"]]
+    return job_ids if num is None else job_ids[max(0, len(job_ids) - num):]
+
+
+
+def import_json_job_ids(json_filename, filename):
+    """Append the records of a dump_job_ids() JSON file to the journal `filename`.
+
+    Each (time, num_jobs) pair of the JSON file becomes one journal record with its original time.
+    """
+    with open(json_filename, 'r') as f:
+        data = json.load(f)
+
+    lines = []
+    start = 0
+    for time_str, num_jobs in zip(data["time"], data["num_jobs"]):
+        lines.append(json.dumps({
+            "time": time_str,
+            "timestamp": datetime.fromisoformat(time_str).timestamp(),
+            "qubit_layout": data["qubit_layout"],
+            "num_jobs": num_jobs,
+            "job_ids": data["job_ids"][start:start + num_jobs],
+        }) + '\n')
+        start += num_jobs
+
+    with open(filename, 'ab+') as f:
+        with _locked(f, exclusive = True):
+            _unindexed(filename, f, repair = True)
+            f.seek(0, os.SEEK_END)
+            f.write(''.join(lines).encode())
+            f.flush()
+            _unindexed(filename, f, repair = True)
+    return len(lines)
@@ -0,0 +1,116 @@
+import hashlib
+import os
+
+import numpy as np
+
+# input hash -> {"leakage", "capacity", "input_distribution"}
+_leakage_cache = {}
+
+
+def _tensor_key(tensor, tol, max_iter):
+    digest = hashlib.sha256()
+    digest.update(f"{tensor.shape}:{tensor.dtype.str}:{tol}:{max_iter}".encode())
+    digest.update(np.ascontiguousarray(tensor).tobytes())
+    return digest.hexdigest()
+
+
+
+def blahut_arimoto(channels, tol = 1e-9, max_iter = 10000):
+    """Capacity of every discrete memoryless channel of a grid, iterated in lockstep.
+    Args:
+        channels (np.ndarray): (..., input_state, output) transition probabilities W(output | input).
+        tol (float): Stop once the gap between the upper and lower capacity bounds is below tol (bits) everywhere.
+        max_iter (int): Iteration limit.
+    Return:
+        tuple: Capacities in bits (...), and the capacity-achieving input distributions (..., input_state).
+    """
+    W = np.asarray(channels, dtype = float)
+    W = W / W.sum(axis = -1, keepdims = True)
+    grid_shape = W.shape[:-2]
+    W = W.reshape((-1, ) + W.shape[-2:])
+    log_W = np.log2(np.where(W > 0, W, 1))
+    r = np.full(W.shape[:-1], 1 / W.shape[-2])
+    capacity = np.zeros(len(W))
+
+    # only the channels whose bounds have not met yet are iterated
+    active = np.arange(len(W))
+    for _ in range(max_iter):
+        q = np.einsum('cx,cxy->cy', r[active], W[active])
+        log_q = np.log2(np.where(q > 0, q, 1))
+        # D(x) = KL(W(.|x) || q), in bits
+        divergence = np.sum(W[active] * (log_W[active] - log_q[:, None, :]), axis = -1)
+        weights = r[active] * np.exp2(divergence)
+        capacity[active] = np.log2(weights.sum(axis = -1))
+        r[active] = weights / weights.sum(axis = -1, keepdims = True)
+        active = active[divergence.max(axis = -1) - capacity[active] >= tol]
+        if not len(active):
+            break
+    return capacity.reshape(grid_shape), r.reshape(grid_shape + r.shape[-1:])
+
+
+
+def leakage(channels):
+    """Largest total variation distance between the output distributions of two input states:
+    for prepared |0> and |3> and a binary readout, |P(1 | |3>) - P(1 | |0>)|.
+    Args:
+        channels (np.ndarray): (..., input_state, output) transition probabilities.
+    Return:
+        np.ndarray: Leakage (...), between 0 and 1.
+    """
+    W = np.asarray(channels, dtype = float)
+    distance = 0.5 * np.abs(W[..., :, None, :] - W[..., None, :, :]).sum(axis = -1)
+    return distance.max(axis = (-2, -1))
+
+
+
+def channel_metrics(channels, tol = 1e-9, max_iter = 10000, cache_dir = None):
+    """Leakage and channel capacity of every point of a (protocol, delay, input_state, output) grid.
+
+    Results are cached by the hash of the tensor, in memory and, with cache_dir, on disk as .npz,
+    so re-plotting the same data does not recompute them.
+    Return:
+        dict: "leakage" and "capacity" (protocol, delay), "input_distribution" (protocol, delay, input_state),
+            as copies of the cached arrays, so callers may modify them.
+    """
+    channels = np.asarray(channels, dtype = float)
+    key = _tensor_key(channels, tol, max_iter)
+    if key in _leakage_cache:
+        return {name: value.copy() for name, value in _leakage_cache[key].items()}
+
+    filename = os.path.join(cache_dir, key + '.npz') if cache_dir else None
+    if filename and os.path.isfile(filename):
+        with np.load(filename) as data:
+            metrics = _leakage_cache.setdefault(key, {name: data[name] for name in data.files})
+        return {name: value.copy() for name, value in metrics.items()}
+
+    capacity, input_distribution = blahut_arimoto(channels, tol, max_iter)
+    metrics = _leakage_cache.setdefault(key, {
+        "leakage": leakage(channels),
+        "capacity": capacity,
+        "input_distribution": input_distribution,
+    })
+    if filename:
+        os.makedirs(cache_dir, exist_ok = True)
+        # write-then-rename, so concurrent sessions never read a partial file
+        with open(f"{filename}.{os.getpid()}.tmp", 'wb') as f:
+            np.savez(f, **metrics)
+        os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+    return {name: value.copy() for name, value in metrics.items()}
+
+
+
+def transition_tensor(prob_df, protocols, states = ('p0', 'p3'), suffix = ''):
+    """Build the (protocol, delay, input_state, output) tensor from a state-leakage probability frame.
+
+    The columns of prob_df are named f"{state}-{protocol}{suffix}" (e.g. 'p3-d-1csr2-m' for
+    protocol 'd-1csr2' and suffix '-m') and hold the probability of measuring 1.
+    Args:
+        prob_df (pd.DataFrame): The second frame of a 2-state_leakage/data/*.p pickle.
+        protocols (list): Protocol names, e.g. ['d', 'd-r', 'd-1csr2'].
+        states (tuple): Prepared-state column prefixes, one per input state.
+        suffix (str): Column suffix, e.g. '-m'.
+    Return:
+        np.ndarray: (len(protocols), num_delays, len(states), 2) transition probabilities.
+    """
+    p1 = np.stack([np.stack([prob_df[f"{state}-{protocol}{suffix}"].to_numpy(dtype = float) for state in states], axis = -1) for protocol in protocols])
+    return np.stack([1 - p1, p1], axis = -1)
@@ -0,0 +1,331 @@
+"""Resumable experiment pipelines: build -> transpile -> submit -> retrieve -> reduce -> store.
+
+Every stage writes its output to a checkpoint in the pipeline directory before the stages
+that need it start, so an interrupted run picks up after the last finished stage; stages
+that do not depend on each other (e.g. the chains of two experiments) run concurrently.
+
+Command line, with a spec file defining setup(pipeline):
+    python -m utils.pipeline experiments/1-basis_gate_and_decoherence/reset_pipeline.py \
+        --dir runs/reset --backend fake_lagos [--workers 4] [--redo reset.submit]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import pickle
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+STAGES = ('build', 'transpile', 'submit', 'retrieve', 'reduce', 'store')
+
+
+class Pipeline:
+    """A set of stages, each a function of the outputs of the stages it requires, checkpointed to `dirname`.
+
+    Stage outputs are pickled to <dirname>/checkpoints/<stage>.pickle (write-then-rename); a stage
+    with a checkpoint is done and its output is loaded instead of running it again.
+    """
+
+    def __init__(self, dirname, backend, max_workers = 4):
+        self.dirname = dirname
+        self.backend = backend
+        self.max_workers = max_workers
+        self._stages = {}
+        os.makedirs(os.path.join(dirname, 'checkpoints'), exist_ok = True)
+
+
+
+    def add_stage(self, name, func, requires = ()):
+        """Add stage `name`, run as func(*outputs of `requires`)."""
+        for required in requires:
+            if required not in self._stages:
+                raise ValueError(f"Stage {name} requires unknown stage {required}.")
+        self._stages[name] = (func, tuple(requires))
+
+
+
+    def add_experiment(self, name, build, reduce = None, transpile_options = None, qubit_layout = None, **run_options):
+        """Add the build -> transpile -> submit -> retrieve -> reduce -> store chain of one sweep,
+        as stages "<name>.build" ... "<name>.store".
+        Args:
+            name (str): Experiment name; also the name of its job-id journal and result store.
+            build (callable): build(backend) -> sweep, {coordinate: entry} as in experiment_utils.pack_sweep().
+            reduce (callable): reduce(routed) -> array, from {coordinate: counts (or list of counts)}.
+                               Defaults to the probability of reading 0 and 1 on every qubit,
+                               (num_points, num_circuits, num_qubits, 2).
+            transpile_options (dict): Options of cached_transpile(), e.g. {'optimization_level': 0};
+                                      None skips transpilation.
+            qubit_layout (list): Recorded with the job ids.
+            run_options: Options of run_sweep(), e.g. shots, rep_delay, init_qubits.
+        """
+        stage = lambda step: f"{name}.{step}"
+        self.add_stage(stage('build'), lambda: build(self.backend))
+        self.add_stage(stage('transpile'), lambda sweep: _transpile_sweep(sweep, self.backend, transpile_options), [stage('build')])
+        self.add_stage(stage('submit'), lambda sweep: self._submit(name, sweep, qubit_layout, run_options), [stage('transpile')])
+        self.add_stage(stage('retrieve'), self._retrieve, [stage('submit')])
+        self.add_stage(stage('reduce'), lambda retrieved: _reduce(retrieved, reduce), [stage('retrieve')])
+        self.add_stage(stage('store'), lambda reduced, submitted: self._store(name, reduced, submitted), [stage('reduce'), stage('submit')])
+
+
+
+    def checkpoint_file(self, name):
+        return os.path.join(self.dirname, 'checkpoints', name + '.pickle')
+
+
+
+    def partial_file(self, name):
+        """Journal of the progress of stage `name` before its checkpoint, e.g. the jobs a submit stage got accepted."""
+        return os.path.join(self.dirname, 'checkpoints', name + '.partial.jsonl')
+
+
+
+    def done(self, name):
+        return os.path.isfile(self.checkpoint_file(name))
+
+
+
+    def redo(self, name):
+        """Delete the checkpoints of stage `name` and of every stage depending on it."""
+        stale = {name}
+        for stage, (_, requires) in self._stages.items():   # stages are added after their requirements
+            if stale & set(requires):
+                stale.add(stage)
+        for stage in stale:
+            for filename in [self.checkpoint_file(stage), self.partial_file(stage)]:
+                if os.path.isfile(filename):
+                    os.remove(filename)
+
+
+
+    def _load(self, name):
+        with open(self.checkpoint_file(name), 'rb') as f:
+            return pickle.load(f)
+
+
+
+    def _save(self, name, output):
+        filename = self.checkpoint_file(name)
+        with open(f"{filename}.{os.getpid()}.tmp", 'wb') as f:
+            pickle.dump(output, f)
+        os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+
+
+
+    def run(self, stages = None):
+        """Run the given stages (default all) and the stages they require, skipping checkpointed ones.
+        Return:
+            dict: {stage: output} of the stages that were run or loaded.
+        """
+        needed = set()
+        pending = list(stages or self._stages)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                if not self.done(name):
+                    pending.extend(self._stages[name][1])
+
+        outputs = {}
+        remaining = []
+        for name in self._stages:
+            if name not in needed:
+                continue
+            if self.done(name):
+                outputs[name] = self._load(name)
+                print(f'{name}: loaded from checkpoint')
+            else:
+                remaining.append(name)
+
+        errors = []
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            running = {}
+            while remaining or running:
+                for name in [name for name in remaining if all(required in outputs for required in self._stages[name][1])]:
+                    func, requires = self._stages[name]
+                    running[executor.submit(func, *[outputs[required] for required in requires])] = name
+                    remaining.remove(name)
+                finished, _ = wait(running, return_when = FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        # start nothing new, but let the running stages finish and checkpoint
+                        errors.append(future.exception())
+                        remaining = []
+                        print(f'{name}: failed')
+                        continue
+                    outputs[name] = future.result()
+                    self._save(name, outputs[name])
+                    print(f'{name}: done')
+        if errors:
+            raise errors[0]
+        return outputs
+
+
+
+    def _submit(self, name, sweep, qubit_layout, run_options):
+        """Submit the sweep, journaling every accepted job to the partial file of the stage, so that
+        a resumed run only submits the jobs the interrupted one did not get accepted.
+        Jobs of local simulators do not outlive their process and are always submitted again.
+        """
+        from .experiment_utils import run_sweep
+
+        partial_file = self.partial_file(f"{name}.submit")
+        job_ids = None
+        if os.path.isfile(partial_file) and not self.backend.configuration().simulator:
+            job_ids = {}
+            with open(partial_file, 'r') as f:
+                for line in f:
+                    if line.endswith('\n'):   # a torn last line is a job that was not recorded
+                        entry = json.loads(line)
+                        job_ids[entry["position"]] = entry["job_id"]
+            print(f'{name}.submit: {len(job_ids)} jobs were submitted before, resuming')
+
+        with open(partial_file, 'w') as f:
+            def on_submit(position, job_id):
+                f.write(json.dumps({"position": position, "job_id": job_id}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+            # rewritten without a torn last line, which the next record would otherwise extend
+            for position, job_id in (job_ids or {}).items():
+                on_submit(position, job_id)
+            job_ids, index = run_sweep(sweep, self.backend, qubit_layout = qubit_layout, dirname = self.dirname, filename = f"{name}_job_ids.jsonl",
+                                       job_ids = job_ids, on_submit = on_submit, **run_options)
+        submitted = {"job_ids": job_ids, "index": index}
+        if self.backend.configuration().simulator:
+            # local jobs are finished already, and cannot be retrieved by a later process
+            submitted["results"] = [self.backend.retrieve_job(job_id).result() for job_id in job_ids]
+        return submitted
+
+
+
+    def _retrieve(self, submitted):
+        """Wait for the jobs and keep their results, which (unlike jobs) survive a restart on any backend."""
+        if "results" in submitted:
+            return {"results": submitted["results"], "index": submitted["index"]}
+
+        def result(job_id):
+            return self.backend.retrieve_job(job_id).result()
+
+        with ThreadPoolExecutor(max_workers = self.max_workers) as executor:
+            results = list(executor.map(result, submitted["job_ids"]))
+        return {"results": results, "index": submitted["index"]}
+
+
+
+    def _store(self, name, reduced, submitted):
+        from .store_utils import ResultStore
+
+        store = ResultStore(os.path.join(self.dirname, name + '.store'))
+        store.write_column('data', reduced["data"])
+        store.set_metadata(
+            backend = self.backend.configuration().backend_name,
+            coordinates = json.loads(json.dumps(reduced["coordinates"], default = str)),
+            job_ids = submitted["job_ids"],
+        )
+        return store.dirname
+
+
+
+def _transpile_sweep(sweep, backend, transpile_options):
+    """Transpile all circuits of a sweep in one cached_transpile() call, keeping the entry layout."""
+    if transpile_options is None:
+        return sweep
+    from .cache_utils import cached_transpile
+
+    entries = []
+    circs = []
+    for coordinate, entry in sweep.items():
+        entry_circs, options = entry if isinstance(entry, tuple) else (entry, None)
+        single = not isinstance(entry_circs, list)
+        entries.append((coordinate, single, len(circs), options))
+        circs.extend([entry_circs] if single else entry_circs)
+    transpiled = cached_transpile(circs, backend, **transpile_options)
+
+    starts = [start for _, _, start, _ in entries] + [len(circs)]
+    transpiled_sweep = {}
+    for k, (coordinate, single, start, options) in enumerate(entries):
+        entry_circs = transpiled[start] if single else transpiled[start:starts[k + 1]]
+        transpiled_sweep[coordinate] = entry_circs if options is None else (entry_circs, options)
+    return transpiled_sweep
+
+
+
+def _reduce(retrieved, reduce = None):
+    from .experiment_utils import sweep_results
+    from .result_utils import marginal_counts_array
+
+    routed = sweep_results(retrieved["results"], retrieved["index"])
+    if reduce is not None:
+        data = reduce(routed)
+    else:
+        data = []
+        for counts in routed.values():
+            marginal = marginal_counts_array(counts if isinstance(counts, list) else [counts])
+            data.append(marginal / marginal.sum(axis = -1, keepdims = True))
+        data = np.array(data)
+    return {"coordinates": list(routed), "data": data}
+
+
+
+def get_backend(name, provider_file = None):
+    """Backend by name: 'fake_<device>' (e.g. fake_lagos) is the qiskit fake backend wrapped in
+    HigherEnergySimulator; any other name is an IBM Quantum backend of the provider in provider_file.
+    """
+    if name.startswith('fake_'):
+        from qiskit.providers import fake_provider
+        from .higher_energy_states import HigherEnergySimulator
+
+        class_name = 'Fake' + ''.join(part.capitalize() for part in name[len('fake_'):].split('_'))
+        if not hasattr(fake_provider, class_name):
+            raise ValueError(f"Unknown fake backend {name}.")
+        return HigherEnergySimulator(getattr(fake_provider, class_name)())
+
+    from qiskit import IBMQ
+
+    if not provider_file:
+        raise ValueError("A provider file (hub, group, project) is needed for IBM Quantum backends.")
+    with open(provider_file, 'r') as f:
+        credential = json.load(f)
+    IBMQ.load_account()
+    provider = IBMQ.get_provider(hub = credential["hub"], group = credential["group"], project = credential["project"])
+    return provider.get_backend(name)
+
+
+
+def _load_spec(filename):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(filename))[0], filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, 'setup'):
+        raise ValueError(f"{filename} does not define setup(pipeline).")
+    return module
+
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Run a resumable experiment pipeline.")
+    parser.add_argument('spec', help = "Python file defining setup(pipeline), which adds the experiments.")
+    parser.add_argument('--dir', required = True, help = "Pipeline directory: checkpoints, job-id journals and result stores.")
+    parser.add_argument('--backend', default = 'fake_lagos', help = "fake_<device> for a local simulator, or an IBM Quantum backend name.")
+    parser.add_argument('--provider', default = None, help = "JSON file with hub, group and project, for IBM Quantum backends.")
+    parser.add_argument('--workers', type = int, default = 4, help = "Stages and job retrievals run at once.")
+    parser.add_argument('--redo', action = 'append', default = [], help = "Run this stage and the ones after it again (repeatable).")
+    parser.add_argument('--stage', action = 'append', default = None, help = "Only run up to this stage (repeatable).")
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(args.dir, get_backend(args.backend, args.provider), max_workers = args.workers)
+    _load_spec(args.spec).setup(pipeline)
+    for name in args.redo:
+        pipeline.redo(name)
+    outputs = pipeline.run(args.stage)
+    for name, output in outputs.items():
+        if name.endswith('.store'):
+            print(f'{name}: {output}')
+    return outputs
+
+
+
+if __name__ == '__main__':
+    main()
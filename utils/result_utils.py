@@ -1,4 +1,6 @@
-def load_job_ids(dirname = None, filename = None, num = None):
+from .trace_utils import record_span, span, traced
+
+def load_job_ids(dirname = None, filename = None, num = None, qubit_layout = None):
     from datetime import datetime
     import json
     import os
@@ -12,6 +14,13 @@ def load_job_ids(dirname = None, filename = None, num = None):
     if not filename:
         filename = "jobs_ids_" + str(datetime.now()).replace('-','_').replace(' ','_').replace(':','_')[:19] + ".json"
     
+    # '.jsonl' files are append-only journals, see journal_utils
+    if filename.endswith('.jsonl'):
+        from .journal_utils import tail_job_ids
+        job_ids = tail_job_ids(os.path.join(dirname, filename), num if isinstance(num, int) else None, qubit_layout)
+        print('job_ids were successfully loaded')
+        return job_ids
+    
     with open(os.path.join(dirname, filename), 'r') as f:
         data = json.load(f)
         print('job_ids were successfully loaded')
@@ -23,22 +32,179 @@ def load_job_ids(dirname = None, filename = None, num = None):
 
 
 
-def get_time_taken(job_ids, backend):
-    return [backend.retrieve_job(job_id).result().to_dict()['time_taken'] for job_id in job_ids]
+def _step_seconds(time_per_step, start_steps, end_steps):
+    """(start datetime, seconds) from the first of start_steps to the first of end_steps in job.time_per_step(),
+    or (None, None) if either is missing."""
+    start = next((time_per_step[step] for step in start_steps if step in time_per_step), None)
+    end = next((time_per_step[step] for step in end_steps if step in time_per_step), None)
+    if start is None or end is None:
+        return None, None
+    return start, (end - start).total_seconds()
+
+
+
+def _record_step_span(name, start, duration, job_id):
+    """Trace a span known by its server-side datetime, placed on the local timeline."""
+    from datetime import datetime
+    import time
+
+    if duration is not None:
+        ago = (datetime.now(start.tzinfo) - start).total_seconds()
+        record_span(name, time.perf_counter() - ago, duration, job_id = job_id)
+
+
+
+def get_job_timing(job_ids, backend, max_workers = 8):
+    """Where the time of each job went, with the jobs retrieved concurrently.
+    Args:
+        job_ids (list): The job ids.
+        backend (Backend): The backend the jobs ran on.
+        max_workers (int): Jobs retrieved at once.
+    Return:
+        list: One dict per job, in order: "queue" (seconds from queued to running) and "running"
+              (running to completed) from job.time_per_step(), None if the job does not report them;
+              "time_taken" of the result; "fetch", the seconds spent retrieving the job and its result.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import time
+
+    def timing(job_id):
+        start = time.perf_counter()
+        with span('job.result', job_id = job_id):
+            job = backend.retrieve_job(job_id)
+            result = job.result()
+        fetch = time.perf_counter() - start
+
+        time_per_step = (job.time_per_step() if hasattr(job, 'time_per_step') else None) or {}
+        queued, queue = _step_seconds(time_per_step, ('QUEUED', 'VALIDATED'), ('RUNNING', ))
+        running, run = _step_seconds(time_per_step, ('RUNNING', ), ('COMPLETED', ))
+        _record_step_span('queue', queued, queue, job_id)
+        _record_step_span('running', running, run, job_id)
+        return {"job_id": job_id, "queue": queue, "running": run,
+                "time_taken": result.to_dict().get('time_taken'), "fetch": fetch}
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        return list(executor.map(timing, job_ids))
+
+
+
+def get_time_taken(job_ids, backend, max_workers = 8):
+    """Server-side time_taken of each job, with the jobs retrieved concurrently; see get_job_timing()."""
+    return [timing["time_taken"] for timing in get_job_timing(job_ids, backend, max_workers = max_workers)]
+
+
+
+def _count_outcomes(count):
+    """Split one counts dictionary into integer outcomes, shot counts and register width.
 
+    Keys may be bitstrings (optionally with register spaces, as returned by
+    ``Counts``) or hexadecimal strings (as in ``result.data.counts``).
+    """
+    outcomes = []
+    values = []
+    num_clbits = getattr(count, 'memory_slots', None) or 0
+    for key, value in count.items():
+        if isinstance(key, int):
+            outcome = key
+        elif key.startswith('0x'):
+            outcome = int(key, 16)
+        else:
+            key = key.replace(' ', '')
+            outcome = int(key, 2)
+            num_clbits = max(num_clbits, len(key))
+        outcomes.append(outcome)
+        values.append(value)
+    num_clbits = max([num_clbits] + [outcome.bit_length() for outcome in outcomes])
+    return outcomes, values, num_clbits
 
 
+
+def _outcome_bits(outcomes, num_clbits):
+    """Unpack integer outcomes into a (n_outcomes, num_clbits) uint8 matrix of bits.
+
+    Works for registers wider than 64 bits (27- and 127-qubit devices), since the
+    outcomes are packed through bytes instead of fixed-width integers.
+    Column ``i`` holds classical bit ``i``, i.e. the i-th character from the right
+    of the bitstring key.
+    """
+    import numpy as np
+    num_bytes = max(1, (num_clbits + 7) // 8)
+    packed = b''.join(outcome.to_bytes(num_bytes, 'little') for outcome in outcomes)
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8).reshape((-1, num_bytes)), axis=1, bitorder='little')
+    return bits[:, :num_clbits]
+
+
+
+@traced('marginal_counts_array')
+def marginal_counts_array(counts, qubits = None):
+    """Marginalize counts onto every requested qubit in a single pass.
+    Args:
+        counts (Counts or dict or list): Counts of one circuit or a list of counts, one per circuit.
+        qubits (list): Classical bit indices to marginalize onto. Defaults to all bits.
+    Return:
+        np.ndarray: Integer array of shape (n_circuits, n_qubits, 2), where [..., 0] and [..., 1]
+                    are the number of shots that measured the bit in 0 and 1 respectively.
+    """
+    import numpy as np
+
+    if isinstance(counts, dict):
+        counts = [counts]
+    parsed = [_count_outcomes(count) for count in counts]
+    num_clbits = max([width for _, _, width in parsed] + [1])
+    if qubits is None:
+        qubits = list(range(num_clbits))
+
+    marginal = np.zeros((len(parsed), len(qubits), 2), dtype=np.int64)
+    for circ_idx, (outcomes, values, _) in enumerate(parsed):
+        if not outcomes:
+            continue
+        bits = _outcome_bits(outcomes, num_clbits)[:, qubits].astype(np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        marginal[circ_idx, :, 1] = values @ bits
+        marginal[circ_idx, :, 0] = values.sum() - marginal[circ_idx, :, 1]
+    return marginal
+
+
+
+@traced('multi_qubit_marginal')
+def multi_qubit_marginal(counts, qubits):
+    """Marginalize counts onto a group of qubits.
+    Args:
+        counts (Counts or dict or list): Counts of one circuit or a list of counts, one per circuit.
+        qubits (list): Classical bit indices of the marginal. qubits[0] is the least significant
+                       bit of the returned outcome index, as in qiskit's marginal_counts.
+    Return:
+        np.ndarray: Integer array of shape (n_circuits, 2**len(qubits)) with the shot count of
+                    every joint outcome of the requested qubits.
+    """
+    import numpy as np
+
+    if isinstance(counts, dict):
+        counts = [counts]
+    parsed = [_count_outcomes(count) for count in counts]
+    num_clbits = max([width for _, _, width in parsed] + [1])
+    weights = np.left_shift(1, np.arange(len(qubits), dtype=np.int64))
+
+    marginal = np.zeros((len(parsed), 2**len(qubits)), dtype=np.int64)
+    for circ_idx, (outcomes, values, _) in enumerate(parsed):
+        if not outcomes:
+            continue
+        index = _outcome_bits(outcomes, num_clbits)[:, qubits] @ weights
+        marginal[circ_idx] = np.bincount(index, weights = values, minlength = 2**len(qubits)).astype(np.int64)
+    return marginal
+
+
+
+@traced('single_qubit_count')
 def single_qubit_count(counts, qubit_idx):
-    num_qubits = len(list(counts[0].keys())[0])
-    count_single_qubit = [[0, 0] for _ in range(len(counts))] 
-    for circ_idx in range(len(counts)):
-        count = counts[circ_idx].int_outcomes()
-        for i in range(2**(num_qubits - qubit_idx)):
-            for j in range(i * 2**qubit_idx, (i+1) * 2**qubit_idx):
-                if j in count.keys():
-                    state = i % 2
-                    count_single_qubit[circ_idx][state] += count[j]
-    return count_single_qubit
+    """Count the 0 and 1 outcomes of one classical bit for each circuit.
+    Args:
+        counts (list): List of counts, one per circuit.
+        qubit_idx (int): Classical bit index.
+    Return:
+        list: [[count_0, count_1], ...] for each circuit.
+    """
+    return marginal_counts_array(counts, [qubit_idx])[:, 0, :].tolist()
 
 
 
@@ -50,7 +216,16 @@ def baseline_remove(values, axis, reshape):
 
 
 def fit_function(x_values, y_values, function, init_params):
-    """Fit a function using scipy curve_fit."""
+    """Fit a function using scipy curve_fit.
+    With function one of the fit_utils.MODELS names ('lorentzian', 'rabi', 'exp_decay'), fit
+    every curve of y_values (..., num_points) at once with fit_utils.fit_batch() instead;
+    init_params may then be None for data-driven initial guesses.
+    """
+    if isinstance(function, str):
+        from .fit_utils import fit_batch
+        fitparams, _, y_fit = fit_batch(x_values, y_values, function, init_params)
+        return fitparams, y_fit
+
     from scipy.optimize import curve_fit
     fitparams, conv = curve_fit(function, x_values, y_values, init_params, maxfev = 50000)
     y_fit = function(x_values, *fitparams)
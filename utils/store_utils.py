@@ -0,0 +1,293 @@
+import json
+import os
+
+import numpy as np
+
+
+class ResultStore:
+    """Columnar, memory-mappable store for experiment results.
+
+    A store is a directory:
+        metadata.json                   experiment metadata (backend, qubit_layout, shots,
+                                        rep_delay, job_ids, ...) and the table of columns
+        <column>.<chunk>.npy            array columns, split into chunks along axis 0
+        <counts>.<chunk>.offsets.npy    counts columns, stored as one sparse chunk per write:
+        <counts>.<chunk>.outcomes.npy   per-circuit offsets into the outcome rows, bit-packed
+        <counts>.<chunk>.values.npy     outcomes and their shot counts
+
+    Every chunk is a plain .npy file, so a column or a single circuit can be read through
+    np.load(mmap_mode='r') without deserializing the rest of the store, and without qiskit.
+    """
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self._table = self._load_table()
+
+
+
+    def _load_table(self):
+        filename = os.path.join(self.dirname, 'metadata.json')
+        if os.path.isfile(filename):
+            with open(filename, 'r') as f:
+                return json.load(f)
+        return {"metadata": {}, "columns": {}, "counts": {}}
+
+
+
+    def _dump_table(self):
+        filename = os.path.join(self.dirname, 'metadata.json')
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(self._table, f, indent = 4)
+        os.replace(filename + '.tmp', filename)
+
+
+
+    def set_metadata(self, **metadata):
+        """Record experiment metadata, e.g. backend, qubit_layout, shots, rep_delay, job_ids."""
+        self._table["metadata"].update(metadata)
+        self._dump_table()
+
+
+
+    def get_metadata(self, key = None):
+        if key:
+            return self._table["metadata"].get(key)
+        else:
+            return self._table["metadata"]
+
+
+
+    def columns(self):
+        return list(self._table["columns"]) + list(self._table["counts"])
+
+
+
+    def write_column(self, name, array):
+        """Replace column `name` with `array`."""
+        self.delete(name)
+        self.append_column(name, array)
+
+
+
+    def append_column(self, name, array):
+        """Append `array` to column `name` as a new chunk along axis 0."""
+        array = np.asarray(array)
+        if array.dtype == object:
+            raise TypeError(f"Column {name} is not a regular numeric array.")
+        if array.ndim == 0:
+            array = array.reshape((1,))
+        column = self._table["columns"].setdefault(name, {"dtype": array.dtype.str, "shape": list(array.shape[1:]), "chunks": []})
+        if list(array.shape[1:]) != column["shape"]:
+            raise ValueError(f"Column {name} has trailing shape {column['shape']}, got {list(array.shape[1:])}.")
+        filename = f"{name}.{len(column['chunks'])}.npy"
+        np.save(os.path.join(self.dirname, filename), array.astype(column["dtype"], copy = False))
+        column["chunks"].append({"file": filename, "length": array.shape[0]})
+        self._dump_table()
+
+
+
+    def read_column(self, name, index = None, mmap = True):
+        """Read column `name`, or only the rows given by `index` (int, slice or list of ints).
+
+        With mmap=True the chunks are memory-mapped, so only the requested rows are read from disk.
+        """
+        column = self._table["columns"][name]
+        chunks = [np.load(os.path.join(self.dirname, chunk["file"]), mmap_mode = 'r' if mmap else None) for chunk in column["chunks"]]
+        if index is None:
+            return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+        rows, scalar = self._rows(index, sum(chunk["length"] for chunk in column["chunks"]))
+        starts = np.cumsum([0] + [chunk["length"] for chunk in column["chunks"]])
+        chunk_idx = np.searchsorted(starts, rows, side = 'right') - 1
+        data = np.empty((len(rows), ) + tuple(column["shape"]), dtype = column["dtype"])
+        for i in np.unique(chunk_idx):
+            mask = chunk_idx == i
+            data[mask] = chunks[i][rows[mask] - starts[i]]
+        return data[0] if scalar else data
+
+
+
+    def write_counts(self, counts, name = 'counts'):
+        """Replace counts column `name` with a list of counts (one dictionary per circuit)."""
+        self.delete(name)
+        self.append_counts(counts, name)
+
+
+
+    def append_counts(self, counts, name = 'counts'):
+        """Append a list of counts (one dictionary per circuit) to counts column `name`."""
+        from .result_utils import _count_outcomes, _outcome_bits
+
+        if isinstance(counts, dict):
+            counts = [counts]
+        parsed = [_count_outcomes(count) for count in counts]
+        num_clbits = max([width for _, _, width in parsed] + [1])
+        outcomes = [outcome for circ_outcomes, _, _ in parsed for outcome in circ_outcomes]
+        values = [value for _, circ_values, _ in parsed for value in circ_values]
+        offsets = np.cumsum([0] + [len(circ_outcomes) for circ_outcomes, _, _ in parsed])
+        bits = _outcome_bits(outcomes, num_clbits) if outcomes else np.zeros((0, num_clbits), dtype = np.uint8)
+
+        column = self._table["counts"].setdefault(name, {"chunks": []})
+        prefix = f"{name}.{len(column['chunks'])}"
+        np.save(os.path.join(self.dirname, prefix + '.offsets.npy'), offsets.astype(np.int64))
+        np.save(os.path.join(self.dirname, prefix + '.outcomes.npy'), np.packbits(bits, axis = 1, bitorder = 'little'))
+        np.save(os.path.join(self.dirname, prefix + '.values.npy'), np.asarray(values, dtype = np.int64))
+        column["chunks"].append({"prefix": prefix, "length": len(parsed), "num_clbits": num_clbits})
+        self._dump_table()
+
+
+
+    def read_counts(self, index = None, name = 'counts'):
+        """Read counts column `name` as a list of {bitstring: count} dictionaries.
+
+        `index` (int, slice or list of ints) selects circuits; only their outcome rows are read.
+        """
+        column = self._table["counts"][name]
+        lengths = [chunk["length"] for chunk in column["chunks"]]
+        rows, scalar = self._rows(slice(None) if index is None else index, sum(lengths))
+        starts = np.cumsum([0] + lengths)
+
+        counts = []
+        for row in rows:
+            chunk_idx = np.searchsorted(starts, row, side = 'right') - 1
+            chunk = column["chunks"][chunk_idx]
+            prefix = os.path.join(self.dirname, chunk["prefix"])
+            offsets = np.load(prefix + '.offsets.npy', mmap_mode = 'r')
+            start, stop = offsets[row - starts[chunk_idx]], offsets[row - starts[chunk_idx] + 1]
+            packed = np.load(prefix + '.outcomes.npy', mmap_mode = 'r')[start:stop]
+            values = np.load(prefix + '.values.npy', mmap_mode = 'r')[start:stop]
+            bits = np.unpackbits(packed, axis = 1, bitorder = 'little')[:, :chunk["num_clbits"]][:, ::-1]
+            keys = [''.join(key) for key in bits.astype(str)] if len(bits) else []
+            counts.append(dict(zip(keys, values.tolist())))
+        return counts[0] if scalar else counts
+
+
+
+    def delete(self, name):
+        """Remove column `name` and its chunk files, if present."""
+        for chunk in self._table["columns"].pop(name, {"chunks": []})["chunks"]:
+            os.remove(os.path.join(self.dirname, chunk["file"]))
+        for chunk in self._table["counts"].pop(name, {"chunks": []})["chunks"]:
+            for suffix in ['.offsets.npy', '.outcomes.npy', '.values.npy']:
+                os.remove(os.path.join(self.dirname, chunk["prefix"] + suffix))
+        self._dump_table()
+
+
+
+    @staticmethod
+    def _rows(index, length):
+        if isinstance(index, (int, np.integer)):
+            return np.array([index % length]), True
+        if isinstance(index, slice):
+            return np.arange(length)[index], False
+        return np.asarray(index, dtype = np.int64) % length, False
+
+
+
+def _is_job(obj):
+    return hasattr(obj, 'job_id') and hasattr(obj, 'result')
+
+
+
+def _store_jobs(store, jobs):
+    """Write counts or measurement level 1 memory of a list of jobs, plus their metadata."""
+    job_ids = []
+    metadata = {}
+    for job in jobs:
+        job_ids.append(job.job_id())
+        result = job.result()
+        meas_level = getattr(result.results[0], 'meas_level', 2)
+        if meas_level == 2:
+            store.append_counts(result.get_counts() if len(result.results) > 1 else [result.get_counts()])
+        else:
+            store.append_column('memory', np.array([result.get_memory(i) for i in range(len(result.results))]))
+        metadata.setdefault("backend", result.backend_name)
+        metadata.setdefault("shots", getattr(result.results[0], 'shots', None))
+        metadata.setdefault("meas_level", int(meas_level))
+        backend_options = job.backend_options() if hasattr(job, 'backend_options') else {}
+        metadata.setdefault("rep_delay", backend_options.get('rep_delay'))
+        header = getattr(result.results[0], 'header', None)
+        qubit_labels = getattr(header, 'qubit_labels', None)
+        metadata.setdefault("qubit_layout", [label[1] for label in qubit_labels] if qubit_labels else None)
+    metadata["job_ids"] = job_ids
+    store.set_metadata(**metadata)
+
+
+
+def _store_data(store, data, name = 'data'):
+    """Write an array, counts, or a nested list/tuple of them that is not regular, as columns."""
+    if isinstance(data, dict) or (isinstance(data, (list, tuple)) and data and all(isinstance(item, dict) for item in data)):
+        store.write_counts(data, name)
+        return
+    try:
+        array = np.asarray(data, dtype = float) if not isinstance(data, np.ndarray) else data
+    except (TypeError, ValueError):
+        array = None
+    if array is not None and array.dtype != object:
+        store.write_column(name, array)
+    else:
+        for i, item in enumerate(data):
+            _store_data(store, item, f"{name}.{i}")
+
+
+
+def migrate_pickle(filename, dirname = None):
+    """One-time conversion of a save_job() pickle into a ResultStore.
+
+    Pickled jobs need the provider that created them to be importable (e.g. qiskit-ibmq-provider),
+    and their results are fetched once; pickled arrays are written as the 'data' column.
+    Args:
+        filename (str): The pickle file written by save_job().
+        dirname (str): The store directory. Defaults to `filename` with '.pickle' replaced by '.store'.
+    Return:
+        ResultStore: The new store.
+    """
+    import pickle
+
+    if not dirname:
+        dirname = os.path.splitext(filename)[0] + '.store'
+    with open(filename, 'rb') as f:
+        obj = pickle.load(f)
+
+    store = ResultStore(dirname)
+    if _is_job(obj) or (isinstance(obj, list) and obj and all(_is_job(item) for item in obj)):
+        _store_jobs(store, obj if isinstance(obj, list) else [obj])
+    else:
+        _store_data(store, obj)
+    store.set_metadata(source = os.path.basename(filename))
+    return store
+
+
+
+def migrate_experiments(root = None, overwrite = False):
+    """Migrate every experiments/*/data/*.pickle into a sibling '.store' directory.
+    Args:
+        root (str): The experiments directory. Defaults to the one next to utils.
+        overwrite (bool): Re-create stores that already exist.
+    Return:
+        dict: {pickle filename: store directory, or the exception that prevented the migration}.
+    """
+    import glob
+    import shutil
+
+    if not root:
+        root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'experiments')
+
+    migrated = {}
+    for filename in sorted(glob.glob(os.path.join(root, '**', 'data', '*.pickle'), recursive = True)):
+        dirname = os.path.splitext(filename)[0] + '.store'
+        if os.path.isdir(dirname):
+            if not overwrite:
+                migrated[filename] = dirname
+                continue
+            shutil.rmtree(dirname)
+        try:
+            migrate_pickle(filename, dirname)
+            migrated[filename] = dirname
+        except Exception as e:
+            if os.path.isdir(dirname):
+                shutil.rmtree(dirname)
+            migrated[filename] = e
+            print(f'Could not migrate "{filename}": {e!r}')
+    return migrated
@@ -0,0 +1,166 @@
+"""Opt-in timing spans around the hot paths: schedule building, circuit generation, transpilation,
+submission, queueing, result download and reductions.
+
+Tracing is off by default and then costs one flag check per call. Typical use:
+
+    from utils.trace_utils import tracing, print_summary
+    with tracing('trace.json'):     # Chrome trace format, open in https://ui.perfetto.dev
+        ...run a sweep...
+    print_summary()
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+_enabled = False
+_spans = []
+_lock = threading.Lock()
+# perf_counter() origin of the trace, so span start times are seconds since tracing started
+_origin = time.perf_counter()
+
+
+def enable_tracing(reset = True):
+    """Start recording spans; with reset=True, drop the spans recorded so far."""
+    global _enabled, _origin
+    with _lock:
+        if reset:
+            _spans.clear()
+            _origin = time.perf_counter()
+        _enabled = True
+
+
+
+def disable_tracing():
+    """Stop recording spans; the recorded ones are kept for export."""
+    global _enabled
+    _enabled = False
+
+
+
+def is_tracing():
+    return _enabled
+
+
+
+def record_span(name, start, duration, **attrs):
+    """Record a span measured elsewhere, e.g. a queue wait from job timestamps.
+    Args:
+        name (str): Span name, e.g. 'queue'.
+        start (float): Start as time.perf_counter() seconds, or None for the current time minus duration.
+        duration (float): Length in seconds.
+        attrs: Extra values kept with the span, e.g. job_id.
+    """
+    if not _enabled:
+        return
+    if start is None:
+        start = time.perf_counter() - duration
+    with _lock:
+        _spans.append({"name": name, "start": start - _origin, "duration": duration,
+                       "thread": threading.get_ident(), "attrs": attrs})
+
+
+
+@contextmanager
+def _span(name, attrs):
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        record_span(name, start, time.perf_counter() - start, **attrs)
+
+
+
+def span(name, **attrs):
+    """Context manager timing its block as span `name`; a no-op unless tracing is enabled.
+    The yielded dict can be filled with more attributes inside the block.
+    """
+    return _span(name, attrs) if _enabled else nullcontext(attrs)
+
+
+
+def traced(name = None):
+    """Decorator timing every call of the function as span `name` (default: its qualified name)."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+
+@contextmanager
+def tracing(filename = None, summary_filename = None):
+    """Enable tracing for a block; on exit, disable it and export the trace and/or summary."""
+    enable_tracing()
+    try:
+        yield
+    finally:
+        disable_tracing()
+        if filename:
+            export_trace(filename)
+        if summary_filename:
+            export_summary(summary_filename)
+
+
+
+def get_spans():
+    """Copies of the recorded spans: dicts of name, start and duration (seconds), thread and attrs."""
+    with _lock:
+        return [dict(s) for s in _spans]
+
+
+
+def summary():
+    """Aggregate the recorded spans by name.
+    Return:
+        dict: {name: {"count", "total", "mean", "max"}} in seconds, by decreasing total.
+              Spans of nested calls (e.g. gen_circ inside a build stage) are counted in both.
+    """
+    stats = {}
+    for s in get_spans():
+        entry = stats.setdefault(s["name"], {"count": 0, "total": 0.0, "max": 0.0})
+        entry["count"] += 1
+        entry["total"] += s["duration"]
+        entry["max"] = max(entry["max"], s["duration"])
+    for entry in stats.values():
+        entry["mean"] = entry["total"] / entry["count"]
+    return dict(sorted(stats.items(), key = lambda item: -item[1]["total"]))
+
+
+
+def print_summary():
+    print(f'{"span":<32}{"count":>8}{"total (s)":>12}{"mean (ms)":>12}{"max (ms)":>12}')
+    for name, entry in summary().items():
+        print(f'{name:<32}{entry["count"]:>8}{entry["total"]:>12.3f}{entry["mean"] * 1e3:>12.2f}{entry["max"] * 1e3:>12.2f}')
+
+
+
+def _write_json(filename, data):
+    with open(f"{filename}.{os.getpid()}.tmp", 'w') as f:
+        json.dump(data, f, default = str)
+    os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+
+
+
+def export_trace(filename):
+    """Write the spans as a Chrome trace (complete events, microseconds), one track per thread."""
+    events = [{
+        "name": s["name"], "ph": "X", "pid": os.getpid(), "tid": s["thread"],
+        "ts": s["start"] * 1e6, "dur": s["duration"] * 1e6, "args": s["attrs"],
+    } for s in get_spans()]
+    _write_json(filename, {"traceEvents": events, "displayTimeUnit": "ms"})
+
+
+
+def export_summary(filename):
+    """Write summary() as JSON."""
+    _write_json(filename, summary())